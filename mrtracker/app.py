@@ -1,10 +1,15 @@
+from datetime import datetime
+
+from rich.console import RenderableType
 from textual.app import App
 from textual.layouts.dock import DockLayout
 from textual.reactive import Reactive, events, watch
 from textual.view import View
 from textual.views._grid_view import GridView
 
-from .config import config
+from . import worker
+from .config import RENDER_STATS_PATH, config
+from .events import DbUpdate
 from .views.help_view import HelpView
 from .views.main_view import MainView
 from .views.stats_view import StatsView
@@ -14,15 +19,18 @@ from .widgets.in_app_logger import ialogger
 class TimeTracker(App):
 
     current_view: Reactive[View | None] = Reactive(None)
+    _full_renders = 0
+    _partial_renders = 0
 
     async def on_load(self) -> None:
         for action, key in config.app_keys.items():
             await self.bind(key, action)
 
-    async def on_db_update(self) -> None:
-        self.stats_v.require_update()
+    async def on_db_update(self, event: DbUpdate) -> None:
+        self.stats_v.require_update(*event.deltas)
 
     async def on_mount(self) -> None:
+        worker.set_error_handler(self._report_db_error)
         self.main_v = MainView()
         self.help_v = HelpView()
         self.stats_v = StatsView()
@@ -30,6 +38,30 @@ class TimeTracker(App):
         await self.main_v.tasklist.post_message(events.Key(self, "down"))
         await self.main_v.tasklist.post_message(events.Key(self, "down"))
         watch(self, "current_view", self.update_view)
+        if RENDER_STATS_PATH:
+            self.set_interval(1, self._report_render_stats)
+
+    def refresh(self, repaint: bool = True, layout: bool = False) -> None:
+        self._full_renders += 1
+        super().refresh(repaint, layout)
+
+    def display(self, renderable: RenderableType) -> None:
+        self._partial_renders += 1
+        super().display(renderable)
+
+    def _report_render_stats(self) -> None:
+        """Appends the numbers of full screen and single widget renders
+        made during the last second to MRTRACKER_RENDER_STATS file"""
+        with open(RENDER_STATS_PATH, "a") as f:
+            f.write(
+                f"{datetime.now():%H:%M:%S} "
+                f"full: {self._full_renders}/s, "
+                f"widget: {self._partial_renders}/s\n"
+            )
+        self._full_renders = self._partial_renders = 0
+
+    def _report_db_error(self, error: BaseException) -> None:
+        ialogger.update(f"[red]Database error[/]\n{error}", error=True)
 
     async def update_view(self, view: GridView) -> None:
         self.clear_screen()
@@ -44,6 +76,8 @@ class TimeTracker(App):
     async def action_quit(self) -> None:
         ialogger.update("[i]Saving data...[/]")
         await self.main_v.save_data()
+        await worker.flush()
+        worker.shutdown()
         await self.shutdown()
 
     async def action_reset_focus(self) -> None:
@@ -1,14 +1,39 @@
-from argparse import ArgumentParser
+from argparse import ArgumentParser, ArgumentTypeError
+from datetime import date
+import os
+import sys
 
-from rich import print
-
-from . import backup
+from . import backup, db, export, importer
 from .config import generate_backup_name, generate_csv_name
+from .stopwatch import sec_to_str
+
+
+def print(*objects) -> None:
+    """rich print, imported only when there is something to print"""
+    from rich import print as rich_print
+
+    rich_print(*objects)
+
+
+def backup_progress(status: int, remaining: int, total: int) -> None:
+    sys.stdout.write(f"\rCopied {total - remaining}/{total} pages")
+    if not remaining:
+        sys.stdout.write("\n")
+    sys.stdout.flush()
+
+
+def silence_stdout() -> None:
+    """The reader of stdout has gone, e.g. `export -p - | head`. Stdout
+    is pointed to devnull, so flushing it at exit doesn't fail again"""
+    devnull = os.open(os.devnull, os.O_WRONLY)
+    os.dup2(devnull, sys.stdout.fileno())
 
 
 def backup_handler(args) -> None:
     try:
-        location = backup.create_backup(args.path)
+        location = backup.create_backup(
+            args.path, compact=args.compact, progress=backup_progress
+        )
     except FileNotFoundError as e:
         print(e)
     except NotADirectoryError as e:
@@ -22,19 +47,91 @@ def restore_handler(args) -> None:
         backup.restore_data(args.filename)
     except FileNotFoundError as e:
         print(e)
+    except ValueError as e:
+        print(f"[red]{e}")
     else:
         print("[green]Data has been restored")
 
 
 def csv_handler(args) -> None:
     try:
-        location = backup.create_csv(args.path)
+        location = backup.create_csv(
+            args.path, args.since, args.until, args.project, args.tag
+        )
+    except BrokenPipeError:
+        silence_stdout()
     except IsADirectoryError as e:
         print(e)
     except NotADirectoryError as e:
         print(e)
     else:
-        print(f"csv vile created at [yellow]{location}[/]")
+        if location != "-":
+            print(f"csv vile created at [yellow]{location}[/]")
+
+
+def export_handler(args) -> None:
+    try:
+        location = export.export(
+            args.path,
+            args.format,
+            args.since,
+            args.until,
+            args.project,
+            args.tag,
+        )
+    except BrokenPipeError:
+        silence_stdout()
+    except IsADirectoryError as e:
+        print(e)
+    except NotADirectoryError as e:
+        print(e)
+    else:
+        if location != "-":
+            print(f"{args.format} file created at [yellow]{location}[/]")
+
+
+def import_handler(args) -> None:
+    try:
+        imported, skipped = importer.import_sessions(args.path, args.format)
+    except FileNotFoundError as e:
+        print(e)
+    except IsADirectoryError as e:
+        print(e)
+    except ValueError as e:
+        print(f"[red]Nothing has been imported, {e}")
+    else:
+        print(
+            f"[green]Imported {imported} sessions[/], "
+            f"skipped {skipped} duplicates"
+        )
+
+
+def stats_handler(args) -> None:
+    rows = db.fetch_range(args.since, args.until, args.group_by)
+    for row in rows:
+        name = f"{row[0]} -> [cyan]{row[2]}[/]" if len(row) > 2 else row[0]
+        print(f"{name} [yellow]{sec_to_str(row[1])}[/]")
+
+
+def check_handler(args) -> None:
+    mismatches = db.check_daily_totals()
+    if not mismatches:
+        print("[green]Daily totals are consistent")
+        return
+
+    print(f"[red]Found {len(mismatches)} inconsistent daily totals:")
+    for day, task_id, stored, actual in mismatches:
+        print(f"{day} task {task_id}: stored {stored}, actual {actual}")
+    if args.repair:
+        db.rebuild_daily_totals()
+        print("[green]Daily totals have been rebuilt")
+
+
+def iso_date(value: str) -> str:
+    try:
+        return date.fromisoformat(value).isoformat()
+    except ValueError:
+        raise ArgumentTypeError(f"invalid date: '{value}', use YYYY-MM-DD")
 
 
 parser = ArgumentParser(
@@ -55,6 +152,13 @@ backup_parser.add_argument(
     default=generate_backup_name(),
     help=f"specify path. Defaults to <current directory>",
 )
+backup_parser.add_argument(
+    "-c",
+    "--compact",
+    dest="compact",
+    action="store_true",
+    help="write a compacted copy (VACUUM INTO) instead of a page by page one",
+)
 backup_parser.set_defaults(func=backup_handler)
 
 restore_parser = commands_parser.add_parser(
@@ -76,6 +180,132 @@ csv_parser.add_argument(
     "--path",
     dest="path",
     default=generate_csv_name(),
-    help=f"specify path. Defaults to <current directory>",
+    help="specify path, '-' for stdout. Defaults to <current directory>",
+)
+csv_parser.add_argument(
+    "-s",
+    "--since",
+    dest="since",
+    type=iso_date,
+    help="export sessions from this day (YYYY-MM-DD)",
+)
+csv_parser.add_argument(
+    "-u",
+    "--until",
+    dest="until",
+    type=iso_date,
+    help="export sessions up to this day (YYYY-MM-DD)",
+)
+csv_parser.add_argument(
+    "--project",
+    dest="project",
+    help="export sessions of this project only",
+)
+csv_parser.add_argument(
+    "--tag",
+    dest="tag",
+    help="export sessions of tasks with this tag only",
 )
 csv_parser.set_defaults(func=csv_handler)
+
+export_parser = commands_parser.add_parser(
+    name="export",
+    help="export sessions with typed timestamps and durations",
+)
+export_parser.add_argument(
+    "-f",
+    "--format",
+    dest="format",
+    choices=export.FORMATS,
+    default="jsonl",
+    help="jsonl or columnar (compact binary). Defaults to jsonl",
+)
+export_parser.add_argument(
+    "-p",
+    "--path",
+    dest="path",
+    help="specify path, '-' for stdout. Defaults to <current directory>",
+)
+export_parser.add_argument(
+    "-s",
+    "--since",
+    dest="since",
+    type=iso_date,
+    help="export sessions from this day (YYYY-MM-DD)",
+)
+export_parser.add_argument(
+    "-u",
+    "--until",
+    dest="until",
+    type=iso_date,
+    help="export sessions up to this day (YYYY-MM-DD)",
+)
+export_parser.add_argument(
+    "--project",
+    dest="project",
+    help="export sessions of this project only",
+)
+export_parser.add_argument(
+    "--tag",
+    dest="tag",
+    help="export sessions of tasks with this tag only",
+)
+export_parser.set_defaults(func=export_handler)
+
+import_parser = commands_parser.add_parser(
+    name="import",
+    help="import sessions from csv or jsonl file, duplicates are skipped",
+)
+import_parser.add_argument(
+    "path",
+    help="path to the file, '-' for stdin",
+)
+import_parser.add_argument(
+    "-f",
+    "--format",
+    dest="format",
+    choices=importer.FORMATS,
+    help="csv or jsonl. Guessed from the extension by default",
+)
+import_parser.set_defaults(func=import_handler)
+
+stats_parser = commands_parser.add_parser(
+    name="stats",
+    help="show time spent in a date range",
+)
+stats_parser.add_argument(
+    "-s",
+    "--since",
+    dest="since",
+    type=iso_date,
+    help="first day (YYYY-MM-DD). Defaults to the first session",
+)
+stats_parser.add_argument(
+    "-u",
+    "--until",
+    dest="until",
+    type=iso_date,
+    help="last day (YYYY-MM-DD). Defaults to the last session",
+)
+stats_parser.add_argument(
+    "-b",
+    "--by",
+    dest="group_by",
+    choices=db.RANGE_GROUPS,
+    default="project",
+    help="group time by. Defaults to project",
+)
+stats_parser.set_defaults(func=stats_handler)
+
+check_parser = commands_parser.add_parser(
+    name="check",
+    help="check that daily totals match the sessions",
+)
+check_parser.add_argument(
+    "-r",
+    "--repair",
+    dest="repair",
+    action="store_true",
+    help="rebuild daily totals from the sessions if they don't match",
+)
+check_parser.set_defaults(func=check_handler)
@@ -1,51 +1,121 @@
 import csv
 import os
-import shutil
+import sqlite3
+import sys
+from typing import Callable, TextIO
 
-from .config import DB_PATH, generate_backup_name, generate_csv_name
-from .db import fetch_for_csv
+from . import db
+from .config import (
+    DB_VERSION,
+    generate_backup_name,
+    generate_csv_name,
+    resolve_output_path,
+)
 
 
-def create_backup(path: str) -> str:
-    """Creates backup and returns its location"""
-    if os.path.isdir(path):
-        backup_path = os.path.join(path, generate_backup_name())
-    elif os.path.isdir(os.path.dirname(path)):
-        backup_path = path
-    else:
-        backup_path = os.path.join(".", path)
+BACKUP_STEP_PAGES = 1024
+
+CSV_COLUMNS = (
+    "project",
+    "task",
+    "tags",
+    "date",
+    "start time",
+    "end time",
+    "duration",
+)
+
+Progress = Callable[[int, int, int], object]
+
 
-    shutil.copy(DB_PATH, backup_path)
+def create_backup(
+    path: str,
+    compact: bool = False,
+    progress: Progress | None = None,
+) -> str:
+    """Creates backup and returns its location.
+
+    The database is copied with the sqlite backup API in steps of
+    BACKUP_STEP_PAGES pages, so a running app is not blocked and the
+    copy is consistent. Compact backups are written with VACUUM INTO.
+    """
+    backup_path = resolve_output_path(path, generate_backup_name())
+    conn = db.get_connection()
+    if compact:
+        if os.path.exists(backup_path):
+            os.remove(backup_path)
+        conn.execute("VACUUM INTO (?)", (backup_path,))
+    else:
+        backup = sqlite3.connect(backup_path)
+        try:
+            conn.backup(backup, pages=BACKUP_STEP_PAGES, progress=progress)
+        finally:
+            backup.close()
     return os.path.abspath(backup_path)
 
 
 def restore_data(path: str) -> None:
-    """Replaces all the data with the data from backup"""
-    shutil.copy(path, DB_PATH)
+    """Replaces all the data with the data from backup.
 
+    The backup is checked first and then copied into the live database
+    in a single transaction, so the data is never left half-restored.
+    """
+    if not os.path.isfile(path):
+        raise FileNotFoundError(f"No such file: '{path}'")
 
-def create_csv(path: str) -> str:
-    """Creates csv file and returns its location"""
-    if os.path.isdir(path):
-        csv_path = os.path.join(path, generate_csv_name())
-    elif os.path.isdir(os.path.dirname(path)):
-        csv_path = path
-    else:
-        csv_path = os.path.join(".", path)
+    backup = sqlite3.connect(path)
+    try:
+        _validate_backup(backup)
+        backup.backup(db.get_connection())
+    except sqlite3.DatabaseError as e:
+        raise ValueError(f"'{path}' is not a valid backup: {e}") from e
+    finally:
+        backup.close()
+    db.migrate()
 
-    data = fetch_for_csv()
+
+def _validate_backup(backup: sqlite3.Connection) -> None:
+    integrity = backup.execute("PRAGMA integrity_check").fetchone()[0]
+    if integrity != "ok":
+        raise sqlite3.DatabaseError(integrity)
+    user_version = backup.execute("PRAGMA user_version").fetchone()[0]
+    if user_version > DB_VERSION:
+        raise sqlite3.DatabaseError("made by a newer version of mrtracker")
+    tables = backup.execute(
+        "SELECT name FROM sqlite_master WHERE type='table'"
+    ).fetchall()
+    if ("sessions",) not in tables:
+        raise sqlite3.DatabaseError("no sessions table")
+
+
+def create_csv(
+    path: str,
+    since: str | None = None,
+    until: str | None = None,
+    project: str | None = None,
+    tag: str | None = None,
+) -> str:
+    """Creates csv file and returns its location. Path '-' means stdout.
+    Rows are streamed from db, so memory usage doesn't depend on the
+    number of sessions"""
+    if path == "-":
+        _write_csv(sys.stdout, since, until, project, tag)
+        sys.stdout.flush()
+        return path
+
+    csv_path = resolve_output_path(path, generate_csv_name())
     with open(csv_path, "w", newline="") as f:
-        writer = csv.writer(f)
-        writer.writerow(
-            (
-                "project",
-                "task",
-                "tags",
-                "date",
-                "start time",
-                "end time",
-                "duration",
-            )
-        )
-        writer.writerows(data)
+        _write_csv(f, since, until, project, tag)
     return os.path.abspath(csv_path)
+
+
+def _write_csv(
+    file: TextIO,
+    since: str | None,
+    until: str | None,
+    project: str | None,
+    tag: str | None,
+) -> None:
+    writer = csv.writer(file)
+    writer.writerow(CSV_COLUMNS)
+    writer.writerows(db.iter_for_csv(since, until, project, tag))
@@ -11,7 +11,7 @@ APP_NAME = "mrtracker"
 DB_NAME = "time.db"
 CONFIG_FILE = "config.json"
 BASE_CONFIG_FILE = "default_config.json"
-DB_VERSION = 1
+DB_VERSION = 5
 
 DATA_DIR = user_data_dir(APP_NAME)
 CONFIG_DIR = user_config_dir(APP_NAME)
@@ -20,6 +20,9 @@ DB_PATH = os.path.join(DATA_DIR, DB_NAME)
 CONFIG_PATH = os.path.join(CONFIG_DIR, CONFIG_FILE)
 BASE_CONFIG_PATH = os.path.join(ROOT_PKG_DIR, BASE_CONFIG_FILE)
 
+DEBUG = bool(os.environ.get("MRTRACKER_DEBUG"))
+RENDER_STATS_PATH = os.environ.get("MRTRACKER_RENDER_STATS")
+
 
 def generate_backup_name() -> str:
     return f"mrtracker_{datetime.now().strftime('%Y-%m-%d_%H:%M:%S')}.backup"
@@ -29,6 +32,24 @@ def generate_csv_name() -> str:
     return f"mrtracker_{datetime.now().strftime('%Y-%m-%d_%H:%M:%S')}.csv"
 
 
+def generate_export_name(extension: str) -> str:
+    date = datetime.now().strftime("%Y-%m-%d_%H:%M:%S")
+    return f"mrtracker_{date}.{extension}"
+
+
+def resolve_output_path(path: str | None, default_name: str) -> str:
+    """Output goes to default_name if path is None or a directory, a file
+    name without an existing directory is placed in the current one"""
+    if path is None:
+        return default_name
+    elif os.path.isdir(path):
+        return os.path.join(path, default_name)
+    elif os.path.isdir(os.path.dirname(path)):
+        return path
+    else:
+        return os.path.join(".", path)
+
+
 def create_dirs(path: str) -> None:
     if not os.path.exists(path):
         create_dirs(os.path.dirname(path))
@@ -66,8 +87,9 @@ class Config:
                 if key in user[section]:
                     base[section][key] = user[section][key]
 
-        with open(CONFIG_PATH, "w") as f1:
-            json.dump(base, f1, indent=4)
+        if base != user:
+            with open(CONFIG_PATH, "w") as f1:
+                json.dump(base, f1, indent=4)
 
     def read_config(self) -> None:
         with open(CONFIG_PATH, "r") as f:
@@ -75,8 +97,23 @@ class Config:
             self.app_keys = cfg["app_keys"]
             self.tasklist_keys = cfg["tasklist_keys"]
             self.stats_keys = cfg["stats_keys"]
+            self.stats = cfg["stats"]
+            self.database = cfg["database"]
             self.styles = cfg["styles"]
 
 
-create_dirs(DATA_DIR)
-config = Config()
+_config: Config | None = None
+
+
+def get_config() -> Config:
+    """Loads config on first use"""
+    global _config
+    if _config is None:
+        _config = Config()
+    return _config
+
+
+def __getattr__(name: str):
+    if name == "config":
+        return get_config()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
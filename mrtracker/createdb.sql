@@ -1,20 +1,26 @@
 PRAGMA foreign_keys=ON;
-PRAGMA user_version=1;
+PRAGMA user_version=5;
 BEGIN TRANSACTION;
 CREATE TABLE IF NOT EXISTS projects(
 	id INTEGER NOT NULL PRIMARY KEY,
-	name INTEGER NOT NULL UNIQUE
+	name INTEGER NOT NULL UNIQUE,
+	position INTEGER NOT NULL DEFAULT 0
 );
 CREATE TABLE IF NOT EXISTS tasks(
     id INTEGER NOT NULL PRIMARY KEY,
     project_id INTEGER NOT NULL,
     name TEXT NOT NULL,
     tags TEXT,
+    position INTEGER NOT NULL DEFAULT 0,
     FOREIGN KEY(project_id)
         REFERENCES projects(id)
         ON DELETE CASCADE
         ON UPDATE CASCADE
 );
+CREATE INDEX IF NOT EXISTS projects_position_idx
+    ON projects(position);
+CREATE INDEX IF NOT EXISTS tasks_position_idx
+    ON tasks(position);
 CREATE TABLE IF NOT EXISTS sessions(
     id INTEGER NOT NULL primary key,
     task_id INTEGER NOT NULL,
@@ -27,4 +33,54 @@ CREATE TABLE IF NOT EXISTS sessions(
         ON DELETE CASCADE
         ON UPDATE CASCADE
 );
+CREATE INDEX IF NOT EXISTS sessions_date_idx
+    ON sessions(date, task_id, duration);
+CREATE INDEX IF NOT EXISTS sessions_task_id_idx
+    ON sessions(task_id, duration);
+CREATE TABLE IF NOT EXISTS daily_task_totals(
+    date TEXT NOT NULL,
+    task_id INTEGER NOT NULL,
+    seconds INTEGER NOT NULL,
+    PRIMARY KEY(date, task_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS daily_task_totals_task_id_idx
+    ON daily_task_totals(task_id, seconds);
+CREATE TABLE IF NOT EXISTS open_session(
+    id INTEGER NOT NULL PRIMARY KEY CHECK(id = 1),
+    task_id INTEGER NOT NULL,
+    start TEXT NOT NULL,
+    checkpoint TEXT NOT NULL,
+    FOREIGN KEY(task_id)
+        REFERENCES tasks(id)
+        ON DELETE CASCADE
+        ON UPDATE CASCADE
+);
+CREATE TRIGGER IF NOT EXISTS sessions_after_insert
+AFTER INSERT ON sessions
+BEGIN
+    INSERT INTO daily_task_totals (date, task_id, seconds)
+    VALUES (NEW.date, NEW.task_id, NEW.duration)
+    ON CONFLICT (date, task_id)
+    DO UPDATE SET seconds = seconds + excluded.seconds;
+END;
+CREATE TRIGGER IF NOT EXISTS sessions_after_delete
+AFTER DELETE ON sessions
+BEGIN
+    UPDATE daily_task_totals SET seconds = seconds - OLD.duration
+    WHERE date = OLD.date AND task_id = OLD.task_id;
+    DELETE FROM daily_task_totals
+    WHERE date = OLD.date AND task_id = OLD.task_id AND seconds = 0;
+END;
+CREATE TRIGGER IF NOT EXISTS sessions_after_update
+AFTER UPDATE OF task_id, date, duration ON sessions
+BEGIN
+    UPDATE daily_task_totals SET seconds = seconds - OLD.duration
+    WHERE date = OLD.date AND task_id = OLD.task_id;
+    DELETE FROM daily_task_totals
+    WHERE date = OLD.date AND task_id = OLD.task_id AND seconds = 0;
+    INSERT INTO daily_task_totals (date, task_id, seconds)
+    VALUES (NEW.date, NEW.task_id, NEW.duration)
+    ON CONFLICT (date, task_id)
+    DO UPDATE SET seconds = seconds + excluded.seconds;
+END;
 COMMIT;
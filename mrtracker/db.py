@@ -1,190 +1,225 @@
-from datetime import datetime, timedelta
+from contextlib import contextmanager
 import os
 import sqlite3
+from typing import Iterable, Iterator
 
-from .config import DB_PATH, ROOT_PKG_DIR
+from .config import (
+    DATA_DIR,
+    DB_PATH,
+    DB_VERSION,
+    ROOT_PKG_DIR,
+    create_dirs,
+    get_config,
+)
+
+
+_conn: sqlite3.Connection | None = None
+_transaction_depth = 0
 
 
 def fetch_tasks() -> list[tuple]:
+    cur = _cursor()
     cur.execute(
-        "SELECT t.id, p.id, t.name, SUM(s.duration), t.tags "
+        "SELECT t.id, p.id, t.name, SUM(d.seconds), t.tags "
         "FROM tasks t "
         "LEFT JOIN projects p "
         "ON t.project_id = p.id "
-        "LEFT JOIN sessions s "
-        "ON t.id = s.task_id "
+        "LEFT JOIN daily_task_totals d "
+        "ON t.id = d.task_id "
         "GROUP BY t.id "
-        "ORDER BY t.id"
+        "ORDER BY t.position"
     )
     return cur.fetchall()
 
 
 def fetch_projects() -> list[tuple]:
+    cur = _cursor()
     cur.execute(
-        "SELECT id, NULL, name, NULL, NULL FROM projects p ORDER BY p.id"
+        "SELECT id, NULL, name, NULL, NULL FROM projects ORDER BY position"
     )
     return cur.fetchall()
 
 
-def fetch_tasks_today() -> list[tuple]:
-    cur.execute(
-        "SELECT t.name, SUM(s.duration) sum, p.name "
-        "FROM sessions s "
-        "LEFT JOIN tasks t "
-        "ON t.id = s.task_id "
-        "LEFT JOIN projects p "
-        "ON t.project_id = p.id "
-        "WHERE date = date('now', 'localtime') "
-        "GROUP BY s.task_id "
-        "ORDER BY sum DESC"
-    )
-    return cur.fetchall()
+def fetch_project_ids() -> dict[str, int]:
+    cur = _cursor()
+    cur.execute("SELECT name, id FROM projects")
+    return dict(cur.fetchall())
 
 
-def fetch_tasks_week() -> list[tuple]:
-    now = datetime.now()
-    week_ago = now - timedelta(days=7)
-    cur.execute(
-        "SELECT t.name, SUM(s.duration) sum, p.name "
-        "FROM sessions s "
-        "LEFT JOIN tasks t "
-        "ON t.id = s.task_id "
-        "LEFT JOIN projects p "
-        "ON t.project_id = p.id "
-        "WHERE date BETWEEN (?) AND (?) "
-        "GROUP BY s.task_id "
-        "ORDER BY sum DESC",
-        (week_ago.strftime("%Y-%m-%d"), now.strftime("%Y-%m-%d")),
-    )
-    return cur.fetchall()
+def fetch_task_ids() -> dict[tuple[int, str], int]:
+    """maps project_id|task name to the id of the first such task"""
+    cur = _cursor()
+    cur.execute("SELECT project_id, name, MIN(id) FROM tasks GROUP BY 1, 2")
+    return {(project_id, name): id for project_id, name, id in cur}
 
 
-def fetch_tasks_month() -> list[tuple]:
-    now = datetime.now()
-    month_ago = now - timedelta(days=30)
+def fetch_stats(since: list[str | None], until: str) -> list[tuple]:
+    """fetches task_id|task|project_id|project|tags followed by the time
+    spent on the task from each of the since dates (None for all time)
+    to until, for every task that has sessions in the longest interval"""
+    if not since:
+        return []
+    cur = _cursor()
+    since = [date if date else "" for date in since]
+    sums = ", ".join(
+        "SUM(CASE WHEN d.date >= (?) THEN d.seconds ELSE 0 END)" for _ in since
+    )
     cur.execute(
-        "SELECT t.name, SUM(s.duration) sum, p.name "
-        "FROM sessions s "
+        "SELECT t.id, t.name, p.id, p.name, t.tags, %s "
+        "FROM daily_task_totals d "
         "LEFT JOIN tasks t "
-        "ON t.id = s.task_id "
+        "ON t.id = d.task_id "
         "LEFT JOIN projects p "
         "ON t.project_id = p.id "
-        "WHERE date BETWEEN (?) AND (?) "
-        "GROUP BY s.task_id "
-        "ORDER BY sum DESC",
-        (month_ago.strftime("%Y-%m-%d"), now.strftime("%Y-%m-%d")),
+        "WHERE d.date BETWEEN (?) AND (?) "
+        "GROUP BY d.task_id" % sums,
+        (*since, min(since), until),
     )
     return cur.fetchall()
 
 
-def fetch_projects_today() -> list[tuple]:
+# columns, additional WHERE condition, GROUP BY, ORDER BY
+_RANGE_GROUPS = {
+    "project": ("p.name, SUM(d.seconds) sum", "", "p.id", "sum DESC"),
+    "task": ("t.name, SUM(d.seconds) sum, p.name", "", "t.id", "sum DESC"),
+    "tag": (
+        "t.tags, SUM(d.seconds) sum",
+        "AND t.tags IS NOT NULL",
+        "t.tags",
+        "sum DESC",
+    ),
+    "day": ("d.date, SUM(d.seconds) sum", "", "d.date", "d.date"),
+    "week": (
+        "strftime('%Y-W%W', d.date) week, SUM(d.seconds) sum",
+        "",
+        "week",
+        "week",
+    ),
+}
+
+RANGE_GROUPS = tuple(_RANGE_GROUPS)
+
+
+def fetch_range(
+    since: str | None, until: str | None, group_by: str
+) -> list[tuple]:
+    """fetches name|time for every project, task (name|time|project), tag,
+    day or week between since and until (both inclusive, None for no bound)
+    """
+    cur = _cursor()
+    columns, condition, group, order = _RANGE_GROUPS[group_by]
     cur.execute(
-        "SELECT p.name, SUM(s.duration) sum "
-        "FROM sessions s "
+        "SELECT %s "
+        "FROM daily_task_totals d "
         "LEFT JOIN tasks t "
-        "ON t.id = s.task_id "
+        "ON t.id = d.task_id "
         "LEFT JOIN projects p "
         "ON t.project_id = p.id "
-        "WHERE date = date('now', 'localtime') "
-        "GROUP BY p.id "
-        "ORDER BY sum DESC"
+        "WHERE d.date BETWEEN (?) AND (?) %s "
+        "GROUP BY %s "
+        "ORDER BY %s" % (columns, condition, group, order),
+        (since if since else "", until if until else "9999-12-31"),
     )
     return cur.fetchall()
 
 
-def fetch_projects_week() -> list[tuple]:
-    now = datetime.now()
-    week_ago = now - timedelta(days=7)
+def fetch_task_info(task_id: int) -> tuple:
+    """fetches task_id|task|project_id|project|tags"""
+    cur = _cursor()
     cur.execute(
-        "SELECT p.name, SUM(s.duration) sum "
-        "FROM sessions s "
-        "LEFT JOIN tasks t "
-        "ON t.id = s.task_id "
+        "SELECT t.id, t.name, p.id, p.name, t.tags "
+        "FROM tasks t "
         "LEFT JOIN projects p "
         "ON t.project_id = p.id "
-        "WHERE date BETWEEN (?) AND (?) "
-        "GROUP BY p.id "
-        "ORDER BY sum DESC",
-        (week_ago.strftime("%Y-%m-%d"), now.strftime("%Y-%m-%d")),
+        "WHERE t.id = (?)",
+        (task_id,),
     )
-    return cur.fetchall()
-
-
-def fetch_projects_month() -> list[tuple]:
-    now = datetime.now()
-    month_ago = now - timedelta(days=30)
+    return cur.fetchone()
+
+
+def iter_for_csv(
+    since: str | None = None,
+    until: str | None = None,
+    project: str | None = None,
+    tag: str | None = None,
+    chunk_size: int = 1000,
+) -> Iterator[tuple]:
+    """yields project|task|tags|date|start_time|end_time|duration(str)
+    for sessions matching the filters, fetching chunk_size rows at a time"""
+    cur = _cursor()
+    where, params = _session_filters(since, until, project, tag)
     cur.execute(
-        "SELECT p.name, SUM(s.duration) sum "
+        "SELECT p.name, t.name, t.tags, s.date, s.start_time, s.end_time, "
+        "printf('%%02d:%%02d:%%02d', "
+        "s.duration / 3600, s.duration %% 3600 / 60, s.duration %% 60) "
         "FROM sessions s "
         "LEFT JOIN tasks t "
-        "ON t.id = s.task_id "
+        "ON s.task_id = t.id "
         "LEFT JOIN projects p "
         "ON t.project_id = p.id "
-        "WHERE date BETWEEN (?) AND (?) "
-        "GROUP BY p.id "
-        "ORDER BY sum DESC",
-        (month_ago.strftime("%Y-%m-%d"), now.strftime("%Y-%m-%d")),
-    )
-    return cur.fetchall()
-
-
-def fetch_tags_today() -> list[tuple]:
-    cur.execute(
-        "SELECT t.tags, SUM(s.duration) sum "
-        "FROM sessions s "
-        "LEFT JOIN tasks t "
-        "ON t.id = s.task_id "
-        "WHERE t.tags IS NOT NULL AND date = date('now', 'localtime') "
-        "GROUP BY t.tags "
-        "ORDER BY sum DESC"
-    )
-    return cur.fetchall()
-
-
-def fetch_tags_week() -> list[tuple]:
-    now = datetime.now()
-    week_ago = now - timedelta(days=7)
-    cur.execute(
-        "SELECT t.tags, SUM(s.duration) sum "
-        "FROM sessions s "
-        "LEFT JOIN tasks t "
-        "ON t.id = s.task_id "
-        "WHERE t.tags IS NOT NULL AND date BETWEEN (?) AND (?) "
-        "GROUP BY t.tags "
-        "ORDER BY sum DESC",
-        (week_ago.strftime("%Y-%m-%d"), now.strftime("%Y-%m-%d")),
-    )
-    return cur.fetchall()
-
-
-def fetch_tags_month() -> list[tuple]:
-    now = datetime.now()
-    month_ago = now - timedelta(days=30)
-    cur.execute(
-        "SELECT t.tags, SUM(s.duration) sum "
-        "FROM sessions s "
-        "LEFT JOIN tasks t "
-        "ON t.id = s.task_id "
-        "WHERE t.tags IS NOT NULL AND date BETWEEN (?) AND (?) "
-        "GROUP BY t.tags "
-        "ORDER BY sum DESC",
-        (month_ago.strftime("%Y-%m-%d"), now.strftime("%Y-%m-%d")),
+        "%s" % where,
+        params,
     )
-    return cur.fetchall()
-
-
-def fetch_for_csv() -> list[tuple]:
-    """fetches project|task|tags|date|start_time|end_time|duration(str)"""
+    yield from _iter_chunks(cur, chunk_size)
+
+
+def iter_sessions(
+    since: str | None = None,
+    until: str | None = None,
+    project: str | None = None,
+    tag: str | None = None,
+    chunk_size: int = 1000,
+) -> Iterator[tuple]:
+    """yields project|task|tags|start|end|duration for sessions matching
+    the filters, start and end are unix timestamps, duration is seconds"""
+    cur = _cursor()
+    where, params = _session_filters(since, until, project, tag)
     cur.execute(
-        "SELECT p.name, t.name, t.tags, s.date, "
-        "s.start_time, s.end_time, time(s.duration, 'unixepoch') "
+        "SELECT p.name, t.name, t.tags, "
+        "CAST(strftime('%%s', s.date || ' ' || s.start_time, 'utc') "
+        "AS INTEGER), "
+        "CAST(strftime('%%s', s.date || ' ' || s.end_time, 'utc') "
+        "AS INTEGER), "
+        "s.duration "
         "FROM sessions s "
         "LEFT JOIN tasks t "
         "ON s.task_id = t.id "
         "LEFT JOIN projects p "
         "ON t.project_id = p.id "
+        "%s" % where,
+        params,
     )
-    return cur.fetchall()
+    yield from _iter_chunks(cur, chunk_size)
+
+
+def _session_filters(
+    since: str | None,
+    until: str | None,
+    project: str | None,
+    tag: str | None,
+) -> tuple[str, tuple]:
+    """WHERE clause for sessions s, tasks t and projects p"""
+    conditions = []
+    params = []
+    for condition, param in (
+        ("s.date >= (?)", since),
+        ("s.date <= (?)", until),
+        ("p.name = (?)", project),
+        ("t.tags = (?)", tag),
+    ):
+        if param is not None:
+            conditions.append(condition)
+            params.append(param)
+    where = "WHERE " + " AND ".join(conditions) if conditions else ""
+    return where, tuple(params)
+
+
+def _iter_chunks(cur: sqlite3.Cursor, chunk_size: int) -> Iterator[tuple]:
+    while True:
+        rows = cur.fetchmany(chunk_size)
+        if not rows:
+            return
+        yield from rows
 
 
 def add_session(
@@ -194,136 +229,334 @@ def add_session(
     end_time: str,
     duration: int,
 ) -> None:
+    cur = _cursor()
     cur.execute(
         "INSERT INTO sessions (task_id, date, start_time, end_time, duration) "
         "VALUES (?, ?, ?, ?, ?)",
         (task_id, date, start_time, end_time, duration),
     )
-    conn.commit()
+    _commit()
 
 
-def add_project(name: str) -> None:
-    cur.execute("INSERT INTO projects (name) VALUES (?)", (name,))
-    conn.commit()
+def open_session(task_id: int, start: str) -> None:
+    """Persists the running session, so it can be recovered after a crash.
+    start is 'YYYY-MM-DD HH:MM:SS'"""
+    cur = _cursor()
+    cur.execute(
+        "INSERT OR REPLACE INTO open_session (id, task_id, start, checkpoint) "
+        "VALUES (1, ?, ?, ?)",
+        (task_id, start, start),
+    )
+    _commit()
+
+
+def checkpoint_open_session(checkpoint: str) -> None:
+    """Moves the end of the open session. A single row update, cheap with
+    WAL and synchronous=NORMAL"""
+    cur = _cursor()
+    cur.execute("UPDATE open_session SET checkpoint = (?)", (checkpoint,))
+    _commit()
+
+
+def fetch_open_session() -> tuple | None:
+    """fetches task_id|start|checkpoint of the session left open"""
+    cur = _cursor()
+    cur.execute("SELECT task_id, start, checkpoint FROM open_session")
+    return cur.fetchone()
+
+
+def delete_open_session() -> None:
+    cur = _cursor()
+    cur.execute("DELETE FROM open_session")
+    _commit()
+
+
+def close_open_session(sessions: list[tuple]) -> None:
+    """Adds task_id|date|start_time|end_time|duration sessions and deletes
+    the open session in one transaction"""
+    cur = _cursor()
+    with transaction():
+        cur.executemany(
+            "INSERT INTO sessions "
+            "(task_id, date, start_time, end_time, duration) "
+            "VALUES (?, ?, ?, ?, ?)",
+            sessions,
+        )
+        cur.execute("DELETE FROM open_session")
+
+
+def add_sessions(chunks: Iterable[list[tuple]]) -> int:
+    """Inserts chunks of task_id|date|start_time|end_time|duration rows in
+    one transaction skipping the sessions whose task, date and start time
+    are already in the db. Returns the number of inserted sessions"""
+    cur = _cursor()
+    inserted = 0
+    with transaction():
+        cur.execute(
+            "CREATE TEMP TABLE IF NOT EXISTS imported_sessions"
+            "(task_id, date, start_time, end_time, duration)"
+        )
+        for chunk in chunks:
+            cur.execute("DELETE FROM imported_sessions")
+            cur.executemany(
+                "INSERT INTO imported_sessions VALUES (?, ?, ?, ?, ?)", chunk
+            )
+            cur.execute(
+                "INSERT INTO sessions "
+                "(task_id, date, start_time, end_time, duration) "
+                "SELECT task_id, date, start_time, end_time, duration "
+                "FROM imported_sessions i "
+                "WHERE NOT EXISTS ("
+                "SELECT 1 FROM sessions s "
+                "WHERE s.date = i.date "
+                "AND s.task_id = i.task_id "
+                "AND s.start_time = i.start_time"
+                ") "
+                "GROUP BY date, task_id, start_time"
+            )
+            inserted += cur.rowcount
+        cur.execute("DROP TABLE imported_sessions")
+    return inserted
+
+
+def add_project(name: str) -> int:
+    """New projects are placed after all the others"""
+    cur = _cursor()
+    cur.execute(
+        "INSERT INTO projects (name, position) "
+        "SELECT ?, IFNULL(MAX(position), 0) + 1 FROM projects",
+        (name,),
+    )
+    _commit()
+    return cur.lastrowid
 
 
-def add_task(name: str, project_id: int) -> None:
+def add_task(name: str, project_id: int, tags: str | None = None) -> int:
+    """New tasks are placed after all the others of the project"""
+    cur = _cursor()
     cur.execute(
-        "INSERT INTO tasks (name, project_id) VALUES (?, ?)",
-        (name, project_id),
+        "INSERT INTO tasks (name, project_id, tags, position) "
+        "SELECT ?, ?, ?, IFNULL(MAX(position), 0) + 1 FROM tasks",
+        (name, project_id, tags),
     )
-    conn.commit()
+    _commit()
+    return cur.lastrowid
 
 
 def delete_project(project_id: int) -> None:
+    cur = _cursor()
     cur.execute("DELETE FROM projects WHERE id=(?)", (project_id,))
-    conn.commit()
+    _commit()
 
 
 def delete_task(task_id: int) -> None:
+    cur = _cursor()
     cur.execute("DELETE FROM tasks WHERE id=(?)", (task_id,))
-    conn.commit()
+    _commit()
 
 
 def rename_project(project_id: int, new_name: str) -> None:
+    cur = _cursor()
     cur.execute(
         "UPDATE projects SET name = (?) WHERE id=(?)",
         (new_name, project_id),
     )
-    conn.commit()
+    _commit()
 
 
 def rename_task(task_id: int, new_name: str) -> None:
+    cur = _cursor()
     cur.execute(
         "UPDATE tasks SET name = (?) WHERE id=(?)",
         (new_name, task_id),
     )
-    conn.commit()
+    _commit()
 
 
 def update_tags(task_ids: list[int], tag: str | None) -> None:
+    cur = _cursor()
     placeholders = ", ".join("?" for _ in task_ids)
     cur.execute(
         "UPDATE tasks SET tags=(?) WHERE id in (%s)" % placeholders,
         (tag, *task_ids),
     )
-    conn.commit()
+    _commit()
 
 
 def change_project(task_id: int, new_project_id: int) -> None:
+    """Moves task to the end of the new project"""
+    cur = _cursor()
     cur.execute(
-        "UPDATE tasks SET project_id = (?) WHERE id=(?)",
+        "UPDATE tasks SET project_id = (?), "
+        "position = (SELECT MAX(position) + 1 FROM tasks) "
+        "WHERE id=(?)",
         (new_project_id, task_id),
     )
-    conn.commit()
+    _commit()
 
 
 def swap_projects(id1: int, id2: int) -> None:
-    cur.execute("UPDATE projects SET id=-1 WHERE id=(?)", (id1,))
-    cur.execute("UPDATE projects SET id=(?) WHERE id=(?)", (id1, id2))
-    cur.execute("UPDATE projects SET id=(?) WHERE id=-1", (id2,))
-    conn.commit()
+    _swap_positions("projects", id1, id2)
 
 
 def swap_tasks(id1: int, id2: int) -> None:
-    cur.execute("UPDATE tasks SET id=-1 WHERE id=(?)", (id1,))
-    cur.execute("UPDATE tasks SET id=(?) WHERE id=(?)", (id1, id2))
-    cur.execute("UPDATE tasks SET id=(?) WHERE id=-1", (id2,))
-    conn.commit()
+    _swap_positions("tasks", id1, id2)
+
+
+def _swap_positions(table: str, id1: int, id2: int) -> None:
+    """Exchanges positions of two rows, ids are kept so nothing cascades"""
+    cur = _cursor()
+    with transaction():
+        cur.execute(
+            "SELECT id, position FROM %s WHERE id IN (?, ?)" % table,
+            (id1, id2),
+        )
+        positions = dict(cur.fetchall())
+        cur.executemany(
+            "UPDATE %s SET position = (?) WHERE id = (?)" % table,
+            [(positions[id2], id1), (positions[id1], id2)],
+        )
 
 
 def delete_sessions_by_task_ids(task_ids: list[int]) -> None:
+    cur = _cursor()
     placeholders = ", ".join("?" for _ in task_ids)
     cur.execute(
         "DELETE FROM sessions WHERE task_id in (%s)" % placeholders, task_ids
     )
-    conn.commit()
+    _commit()
+
+
+def check_daily_totals() -> list[tuple]:
+    """recomputes daily totals from sessions and fetches
+    date|task_id|stored seconds|actual seconds for every mismatch"""
+    cur = _cursor()
+    cur.execute(
+        "WITH actual AS ("
+        "SELECT date, task_id, SUM(duration) seconds "
+        "FROM sessions "
+        "GROUP BY date, task_id "
+        "HAVING seconds != 0) "
+        "SELECT a.date, a.task_id, d.seconds, a.seconds "
+        "FROM actual a "
+        "LEFT JOIN daily_task_totals d "
+        "ON a.date = d.date AND a.task_id = d.task_id "
+        "WHERE d.seconds IS NOT a.seconds "
+        "UNION ALL "
+        "SELECT d.date, d.task_id, d.seconds, NULL "
+        "FROM daily_task_totals d "
+        "LEFT JOIN actual a "
+        "ON a.date = d.date AND a.task_id = d.task_id "
+        "WHERE a.task_id IS NULL "
+        "ORDER BY 1, 2"
+    )
+    return cur.fetchall()
+
+
+def rebuild_daily_totals() -> None:
+    cur = _cursor()
+    cur.execute("DELETE FROM daily_task_totals")
+    cur.execute(
+        "INSERT INTO daily_task_totals (date, task_id, seconds) "
+        "SELECT date, task_id, SUM(duration) "
+        "FROM sessions "
+        "GROUP BY date, task_id "
+        "HAVING SUM(duration) != 0"
+    )
+    _commit()
+
+
+@contextmanager
+def transaction() -> Iterator[None]:
+    """Groups writes of one user action into a single atomic commit.
+    Everything is rolled back if an exception is raised"""
+    global _transaction_depth
+    conn = get_connection()
+    _transaction_depth += 1
+    try:
+        yield
+    except BaseException:
+        if _transaction_depth == 1:
+            conn.rollback()
+        raise
+    else:
+        if _transaction_depth == 1:
+            conn.commit()
+    finally:
+        _transaction_depth -= 1
+
+
+def _commit() -> None:
+    if not _transaction_depth:
+        get_connection().commit()
+
 
+def get_connection() -> sqlite3.Connection:
+    """Opens the database on first use"""
+    global _conn
+    if _conn is None:
+        _conn = _open()
+    return _conn
 
-def get_next_task_id() -> int:
-    cur.execute("SELECT MAX(id) FROM tasks")
-    id = cur.fetchone()[0]
-    return id + 1 if id else 1
 
+def migrate() -> None:
+    """Brings the database up to DB_VERSION, e.g. after restoring backup"""
+    _update_db(get_connection())
 
-def get_next_project_id() -> int:
-    cur.execute("SELECT MAX(id) FROM projects")
-    id = cur.fetchone()[0]
-    return id + 1 if id else 1
+
+def _cursor() -> sqlite3.Cursor:
+    return get_connection().cursor()
+
+
+def _open() -> sqlite3.Connection:
+    create_dirs(DATA_DIR)
+    exists = _db_exists()
+    conn = _connect()
+    if exists:
+        _update_db(conn)
+    else:
+        _init_db(conn)
+    conn.execute("PRAGMA foreign_keys=ON")
+    return conn
 
 
 def _db_exists() -> bool:
     return os.path.exists(DB_PATH)
 
 
-def _init_db() -> None:
+def _init_db(conn: sqlite3.Connection) -> None:
     with open(os.path.join(ROOT_PKG_DIR, "createdb.sql"), "r") as file:
         sql = file.read()
-    cur.executescript(sql)
+    conn.executescript(sql)
     conn.commit()
 
 
-def _update_db() -> None:
-    cur.execute("PRAGMA user_version")
-    user_version = cur.fetchone()[0]
-    if user_version == 0:
-        _migrate_from_0()
+def _update_db(conn: sqlite3.Connection) -> None:
+    user_version = conn.execute("PRAGMA user_version").fetchone()[0]
+    for version in range(user_version, DB_VERSION):
+        _migrate_from(conn, version)
 
 
-def _migrate_from_0() -> None:
-    with open(os.path.join(ROOT_PKG_DIR, "migrate_from_0.sql"), "r") as file:
+def _migrate_from(conn: sqlite3.Connection, version: int) -> None:
+    script = f"migrate_from_{version}.sql"
+    with open(os.path.join(ROOT_PKG_DIR, script), "r") as file:
         sql = file.read()
-    cur.executescript(sql)
+    conn.executescript(sql)
     conn.commit()
 
 
-if not _db_exists():
-    conn = sqlite3.connect(DB_PATH)
-    cur = conn.cursor()
-    _init_db()
-else:
-    conn = sqlite3.connect(DB_PATH)
-    cur = conn.cursor()
-    _update_db()
-
-cur.execute("PRAGMA foreign_keys=ON")
+def _connect() -> sqlite3.Connection:
+    """Opens connection tuned with the database section of the config.
+    The app opens it in the main thread and then uses it from the db
+    worker thread, calls are never concurrent"""
+    settings = get_config().database
+    connection = sqlite3.connect(
+        DB_PATH,
+        cached_statements=settings["cached_statements"],
+        check_same_thread=False,
+    )
+    connection.execute("PRAGMA journal_mode=%s" % settings["journal_mode"])
+    connection.execute("PRAGMA synchronous=%s" % settings["synchronous"])
+    connection.execute("PRAGMA mmap_size=%d" % settings["mmap_size"])
+    connection.execute("PRAGMA temp_store=%s" % settings["temp_store"])
+    return connection
@@ -1,5 +1,54 @@
+from typing import NamedTuple, Union
+
+from textual._types import MessageTarget
 from textual.events import Event
 
 
+class SessionAdded(NamedTuple):
+    task_id: int
+    date: str
+    duration: int
+
+
+class TaskRenamed(NamedTuple):
+    task_id: int
+    name: str
+
+
+class ProjectRenamed(NamedTuple):
+    project_id: int
+    name: str
+
+
+class TaskMoved(NamedTuple):
+    task_id: int
+    project_id: int
+    project: str
+
+
+class TagsChanged(NamedTuple):
+    task_ids: list[int]
+    tag: str | None
+
+
+class SessionsDeleted(NamedTuple):
+    task_ids: list[int]
+
+
+Delta = Union[
+    SessionAdded,
+    TaskRenamed,
+    ProjectRenamed,
+    TaskMoved,
+    TagsChanged,
+    SessionsDeleted,
+]
+
+
 class DbUpdate(Event, bubble=True):
-    pass
+    """Sent after writing to db. Carries the deltas describing the change,
+    no deltas means that anything could have changed"""
+
+    def __init__(self, sender: MessageTarget, *deltas: Delta) -> None:
+        super().__init__(sender)
+        self.deltas = deltas
@@ -0,0 +1,164 @@
+"""Typed exports of sessions for analytics.
+
+Both formats keep start and end as unix timestamps and duration as
+seconds, so nothing has to be parsed back from strings.
+
+jsonl - one JSON object per session.
+
+columnar - little-endian binary format:
+    magic        b"MRCOL1\\n"
+    column count uint16, then for every column:
+        type uint8 (0 - int64, 1 - utf-8 string), name length uint16, name
+    blocks of up to BLOCK_SIZE rows, each one:
+        row count uint32, then every column:
+            int64  - row count int64 values (NULL_INT64 for null)
+            string - row count int32 byte lengths (-1 for null),
+                     blob length uint64, blob
+    row count 0 ends the file
+"""
+from array import array
+import itertools
+import json
+import os
+import struct
+import sys
+from typing import BinaryIO, Iterable, Iterator, TextIO
+
+from . import db
+from .config import generate_export_name, resolve_output_path
+
+
+INT64, STRING = 0, 1
+
+COLUMNS = ("project", "task", "tags", "start", "end", "duration")
+KINDS = (STRING, STRING, STRING, INT64, INT64, INT64)
+
+NULL_INT64 = -(2**63)
+
+MAGIC = b"MRCOL1\n"
+BLOCK_SIZE = 65536
+
+FORMATS = {"jsonl": "jsonl", "columnar": "mrcol"}
+
+
+def export(
+    path: str | None,
+    fmt: str,
+    since: str | None = None,
+    until: str | None = None,
+    project: str | None = None,
+    tag: str | None = None,
+) -> str:
+    """Exports sessions and returns file location. Path '-' means stdout"""
+    rows = db.iter_sessions(since, until, project, tag)
+    if path == "-":
+        if fmt == "jsonl":
+            write_jsonl(sys.stdout, rows)
+        else:
+            write_columnar(sys.stdout.buffer, rows)
+        sys.stdout.flush()
+        return path
+
+    export_path = resolve_output_path(path, generate_export_name(FORMATS[fmt]))
+    if fmt == "jsonl":
+        with open(export_path, "w") as f:
+            write_jsonl(f, rows)
+    else:
+        with open(export_path, "wb") as f:
+            write_columnar(f, rows)
+    return os.path.abspath(export_path)
+
+
+def write_jsonl(file: TextIO, rows: Iterable[tuple]) -> None:
+    for row in rows:
+        file.write(json.dumps(dict(zip(COLUMNS, row)), ensure_ascii=False))
+        file.write("\n")
+
+
+def write_columnar(file: BinaryIO, rows: Iterable[tuple]) -> None:
+    file.write(MAGIC)
+    file.write(struct.pack("<H", len(COLUMNS)))
+    for name, kind in zip(COLUMNS, KINDS):
+        encoded = name.encode()
+        file.write(struct.pack("<BH", kind, len(encoded)))
+        file.write(encoded)
+
+    rows = iter(rows)
+    while block := list(itertools.islice(rows, BLOCK_SIZE)):
+        file.write(struct.pack("<I", len(block)))
+        for column, kind in zip(zip(*block), KINDS):
+            if kind == INT64:
+                _write_ints(
+                    file,
+                    "q",
+                    (v if v is not None else NULL_INT64 for v in column),
+                )
+            else:
+                _write_strings(file, column)
+    file.write(struct.pack("<I", 0))
+
+
+def _write_ints(file: BinaryIO, typecode: str, values: Iterable[int]) -> None:
+    data = array(typecode, values)
+    if sys.byteorder == "big":
+        data.byteswap()
+    file.write(data.tobytes())
+
+
+def _write_strings(file: BinaryIO, values: Iterable[str | None]) -> None:
+    encoded = [v.encode() if v is not None else None for v in values]
+    lengths = (len(v) if v is not None else -1 for v in encoded)
+    _write_ints(file, "i", lengths)
+    blob = b"".join(v for v in encoded if v)
+    file.write(struct.pack("<Q", len(blob)))
+    file.write(blob)
+
+
+def read_columnar(file: BinaryIO) -> dict[str, list]:
+    """Reads the whole columnar file, int64 columns are returned as arrays
+    with NULL_INT64 in place of nulls"""
+    if file.read(len(MAGIC)) != MAGIC:
+        raise ValueError("not a mrtracker columnar file")
+    (count,) = struct.unpack("<H", file.read(2))
+    names, kinds = [], []
+    for _ in range(count):
+        kind, length = struct.unpack("<BH", file.read(3))
+        names.append(file.read(length).decode())
+        kinds.append(kind)
+
+    columns: list = [array("q") if k == INT64 else [] for k in kinds]
+    for size in _iter_blocks(file):
+        for column, kind in zip(columns, kinds):
+            if kind == INT64:
+                column.extend(_read_ints(file, "q", size))
+            else:
+                column.extend(_read_strings(file, size))
+    return dict(zip(names, columns))
+
+
+def _iter_blocks(file: BinaryIO) -> Iterator[int]:
+    while size := struct.unpack("<I", file.read(4))[0]:
+        yield size
+
+
+def _read_ints(file: BinaryIO, typecode: str, size: int) -> array:
+    data = array(typecode)
+    data.frombytes(file.read(size * data.itemsize))
+    if sys.byteorder == "big":
+        data.byteswap()
+    return data
+
+
+def _read_strings(file: BinaryIO, size: int) -> list[str | None]:
+    lengths = _read_ints(file, "i", size)
+    (blob_size,) = struct.unpack("<Q", file.read(8))
+    blob = file.read(blob_size)
+    strings: list[str | None] = []
+    offset = 0
+    for length in lengths:
+        if length < 0:
+            strings.append(None)
+        else:
+            strings.append(blob[offset : offset + length].decode())
+            offset += length
+    return strings
@@ -0,0 +1,145 @@
+"""Imports sessions from files written by the csv and export commands.
+
+Projects and tasks are matched by name and created when missing.
+Sessions whose task, date and start time are already in the database
+are skipped, so the same file can be imported more than once.
+"""
+import csv
+from datetime import datetime
+import itertools
+import json
+import sys
+from typing import Iterable, Iterator, NamedTuple, TextIO
+
+from . import db
+from .backup import CSV_COLUMNS
+
+
+CHUNK_SIZE = 10000
+
+FORMATS = ("csv", "jsonl")
+
+
+class Record(NamedTuple):
+    project: str
+    task: str
+    tags: str | None
+    date: str
+    start_time: str
+    end_time: str
+    duration: int
+
+
+def import_sessions(path: str, fmt: str | None = None) -> tuple[int, int]:
+    """Imports sessions in a single transaction and returns the numbers
+    of imported and skipped sessions. Path '-' means stdin"""
+    if fmt is None:
+        fmt = "jsonl" if path.endswith(".jsonl") else "csv"
+
+    if path == "-":
+        return _import(sys.stdin, fmt)
+    with open(path, newline="") as f:
+        return _import(f, fmt)
+
+
+def _import(file: TextIO, fmt: str) -> tuple[int, int]:
+    records = read_jsonl(file) if fmt == "jsonl" else read_csv(file)
+    resolver = _Resolver()
+    total = 0
+
+    def chunks() -> Iterator[list[tuple]]:
+        nonlocal total
+        while chunk := list(itertools.islice(records, CHUNK_SIZE)):
+            total += len(chunk)
+            yield resolver.resolve(chunk)
+
+    imported = db.add_sessions(chunks())
+    return imported, total - imported
+
+
+class _Resolver:
+    """Caches name to id maps and creates missing projects and tasks"""
+
+    def __init__(self) -> None:
+        self.projects = db.fetch_project_ids()
+        self.tasks = db.fetch_task_ids()
+
+    def resolve(self, records: Iterable[Record]) -> list[tuple]:
+        return [
+            (
+                self._task_id(r),
+                r.date,
+                r.start_time,
+                r.end_time,
+                r.duration,
+            )
+            for r in records
+        ]
+
+    def _task_id(self, record: Record) -> int:
+        project_id = self.projects.get(record.project)
+        if project_id is None:
+            project_id = db.add_project(record.project)
+            self.projects[record.project] = project_id
+
+        key = (project_id, record.task)
+        task_id = self.tasks.get(key)
+        if task_id is None:
+            task_id = db.add_task(record.task, project_id, record.tags)
+            self.tasks[key] = task_id
+        return task_id
+
+
+def read_csv(file: TextIO) -> Iterator[Record]:
+    reader = csv.reader(file)
+    header = next(reader, None)
+    if header is None:
+        return
+    if tuple(header) != CSV_COLUMNS:
+        raise ValueError("line 1: unexpected csv header")
+
+    for line, row in enumerate(reader, start=2):
+        try:
+            project, task, tags, date, start, end, duration = row
+            _check_names(project, task)
+            datetime.fromisoformat(f"{date} {start}")
+            datetime.fromisoformat(f"{date} {end}")
+            hours, minutes, seconds = map(int, duration.split(":"))
+            yield Record(
+                project,
+                task,
+                tags or None,
+                date,
+                start,
+                end,
+                hours * 3600 + minutes * 60 + seconds,
+            )
+        except ValueError as e:
+            raise ValueError(f"line {line}: {e}") from e
+
+
+def read_jsonl(file: TextIO) -> Iterator[Record]:
+    for line, text in enumerate(file, start=1):
+        if not text.strip():
+            continue
+        try:
+            row = json.loads(text)
+            start = datetime.fromtimestamp(row["start"])
+            end = datetime.fromtimestamp(row["end"])
+            _check_names(row["project"], row["task"])
+            yield Record(
+                row["project"],
+                row["task"],
+                row["tags"],
+                start.date().isoformat(),
+                start.time().isoformat("seconds"),
+                end.time().isoformat("seconds"),
+                int(row["duration"]),
+            )
+        except (KeyError, TypeError, ValueError) as e:
+            raise ValueError(f"line {line}: {e!r}") from e
+
+
+def _check_names(project: str, task: str) -> None:
+    if not project or not task:
+        raise ValueError("project and task names are required")
@@ -0,0 +1,7 @@
+BEGIN TRANSACTION;
+CREATE INDEX IF NOT EXISTS sessions_date_idx
+    ON sessions(date, task_id, duration);
+CREATE INDEX IF NOT EXISTS sessions_task_id_idx
+    ON sessions(task_id, duration);
+PRAGMA user_version=2;
+COMMIT;
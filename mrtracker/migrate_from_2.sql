@@ -0,0 +1,44 @@
+BEGIN TRANSACTION;
+CREATE TABLE IF NOT EXISTS daily_task_totals(
+    date TEXT NOT NULL,
+    task_id INTEGER NOT NULL,
+    seconds INTEGER NOT NULL,
+    PRIMARY KEY(date, task_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS daily_task_totals_task_id_idx
+    ON daily_task_totals(task_id, seconds);
+CREATE TRIGGER IF NOT EXISTS sessions_after_insert
+AFTER INSERT ON sessions
+BEGIN
+    INSERT INTO daily_task_totals (date, task_id, seconds)
+    VALUES (NEW.date, NEW.task_id, NEW.duration)
+    ON CONFLICT (date, task_id)
+    DO UPDATE SET seconds = seconds + excluded.seconds;
+END;
+CREATE TRIGGER IF NOT EXISTS sessions_after_delete
+AFTER DELETE ON sessions
+BEGIN
+    UPDATE daily_task_totals SET seconds = seconds - OLD.duration
+    WHERE date = OLD.date AND task_id = OLD.task_id;
+    DELETE FROM daily_task_totals
+    WHERE date = OLD.date AND task_id = OLD.task_id AND seconds = 0;
+END;
+CREATE TRIGGER IF NOT EXISTS sessions_after_update
+AFTER UPDATE OF task_id, date, duration ON sessions
+BEGIN
+    UPDATE daily_task_totals SET seconds = seconds - OLD.duration
+    WHERE date = OLD.date AND task_id = OLD.task_id;
+    DELETE FROM daily_task_totals
+    WHERE date = OLD.date AND task_id = OLD.task_id AND seconds = 0;
+    INSERT INTO daily_task_totals (date, task_id, seconds)
+    VALUES (NEW.date, NEW.task_id, NEW.duration)
+    ON CONFLICT (date, task_id)
+    DO UPDATE SET seconds = seconds + excluded.seconds;
+END;
+INSERT INTO daily_task_totals (date, task_id, seconds)
+SELECT date, task_id, SUM(duration)
+FROM sessions
+GROUP BY date, task_id
+HAVING SUM(duration) != 0;
+PRAGMA user_version=3;
+COMMIT;
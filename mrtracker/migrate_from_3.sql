@@ -0,0 +1,13 @@
+BEGIN TRANSACTION;
+CREATE TABLE IF NOT EXISTS open_session(
+    id INTEGER NOT NULL PRIMARY KEY CHECK(id = 1),
+    task_id INTEGER NOT NULL,
+    start TEXT NOT NULL,
+    checkpoint TEXT NOT NULL,
+    FOREIGN KEY(task_id)
+        REFERENCES tasks(id)
+        ON DELETE CASCADE
+        ON UPDATE CASCADE
+);
+PRAGMA user_version=4;
+COMMIT;
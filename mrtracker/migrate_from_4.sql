@@ -0,0 +1,11 @@
+BEGIN TRANSACTION;
+ALTER TABLE projects ADD COLUMN position INTEGER NOT NULL DEFAULT 0;
+ALTER TABLE tasks ADD COLUMN position INTEGER NOT NULL DEFAULT 0;
+UPDATE projects SET position = id;
+UPDATE tasks SET position = id;
+CREATE INDEX IF NOT EXISTS projects_position_idx
+    ON projects(position);
+CREATE INDEX IF NOT EXISTS tasks_position_idx
+    ON tasks(position);
+PRAGMA user_version=5;
+COMMIT;
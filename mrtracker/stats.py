@@ -0,0 +1,222 @@
+from datetime import date, timedelta
+from typing import Callable, Iterable, NamedTuple
+
+from . import db
+from .events import (
+    Delta,
+    ProjectRenamed,
+    SessionAdded,
+    SessionsDeleted,
+    TagsChanged,
+    TaskMoved,
+    TaskRenamed,
+)
+
+
+TimeInterval = str
+
+DEFAULT_INTERVALS = ("today", "week", "month", "quarter", "year", "all_time")
+
+
+class Interval(NamedTuple):
+    title: str
+    since: Callable[[date], date | None]
+
+
+INTERVALS: dict[TimeInterval, Interval] = dict()
+
+
+def register_interval(name: TimeInterval, title: str):
+    """Registers function that returns the first day of the interval
+    ending today, or None if the interval has no beginning"""
+
+    def decorator(since: Callable[[date], date | None]):
+        INTERVALS[name] = Interval(title, since)
+        return since
+
+    return decorator
+
+
+@register_interval("today", "Today")
+def _today(today: date) -> date:
+    return today
+
+
+@register_interval("week", "Last 7 days")
+def _week(today: date) -> date:
+    return today - timedelta(days=7)
+
+
+@register_interval("month", "Last 30 days")
+def _month(today: date) -> date:
+    return today - timedelta(days=30)
+
+
+@register_interval("quarter", "This quarter")
+def _quarter(today: date) -> date:
+    return today.replace(month=(today.month - 1) // 3 * 3 + 1, day=1)
+
+
+@register_interval("year", "This year")
+def _year(today: date) -> date:
+    return today.replace(month=1, day=1)
+
+
+@register_interval("all_time", "All time")
+def _all_time(today: date) -> None:
+    return None
+
+
+class TaskTotals:
+    """Time spent on one task in every interval"""
+
+    def __init__(self, row: tuple, intervals: list[TimeInterval]) -> None:
+        self.name: str = row[1]
+        self.project_id: int = row[2]
+        self.project: str = row[3]
+        self.tag: str | None = row[4]
+        self.time: dict[TimeInterval, int] = dict(zip(intervals, row[5:]))
+
+    @property
+    def intervals(self) -> set[TimeInterval]:
+        """intervals in which the task has been worked on"""
+        return {ti for ti, time in self.time.items() if time}
+
+
+class Stats:
+    """Projects, tasks and tags rollups for every interval.
+
+    All of them are derived from the per-task totals fetched by a single
+    query over the longest interval and then kept up to date by applying
+    the deltas carried by DbUpdate events.
+    """
+
+    def __init__(self, intervals: Iterable[TimeInterval]) -> None:
+        """Unknown intervals are skipped and kept in unknown_intervals,
+        the default ones are used if none of the intervals is known"""
+        intervals = list(intervals)
+        self.intervals = [ti for ti in intervals if ti in INTERVALS]
+        self.unknown_intervals = [ti for ti in intervals if ti not in INTERVALS]
+        if not self.intervals:
+            self.intervals = list(DEFAULT_INTERVALS)
+        self.today = ""
+        self.totals: dict[int, TaskTotals] = dict()
+        self.projects: dict[TimeInterval, list[tuple]] = dict()
+        self.tasks: dict[TimeInterval, list[tuple]] = dict()
+        self.tags: dict[TimeInterval, list[tuple]] = dict()
+        self.since: dict[TimeInterval, str | None] = dict()
+
+    @property
+    def stale(self) -> bool:
+        """True if the day has changed since the data was collected"""
+        return self.today != date.today().isoformat()
+
+    def collect(self) -> None:
+        today = date.today()
+        self.today = today.isoformat()
+        for ti in self.intervals:
+            since = INTERVALS[ti].since(today)
+            self.since[ti] = since.isoformat() if since else None
+        rows = db.fetch_stats(
+            [self.since[ti] for ti in self.intervals], self.today
+        )
+        self.totals = {row[0]: TaskTotals(row, self.intervals) for row in rows}
+        for ti in self.intervals:
+            self._rollup(ti)
+
+    def apply(self, deltas: Iterable[Delta]) -> set[TimeInterval]:
+        """Applies deltas and returns intervals whose rollups changed.
+        Recollects everything if there are no deltas or the data is stale"""
+        deltas = tuple(deltas)
+        if not deltas or self.stale:
+            self.collect()
+            return set(self.intervals)
+
+        changed: set[TimeInterval] = set()
+        for delta in deltas:
+            changed |= self._apply(delta)
+        for ti in changed:
+            self._rollup(ti)
+        return changed
+
+    def _apply(self, delta: Delta) -> set[TimeInterval]:
+        if isinstance(delta, SessionAdded):
+            return self._add_session(delta)
+        elif isinstance(delta, TaskRenamed):
+            return self._update_tasks([delta.task_id], name=delta.name)
+        elif isinstance(delta, TaskMoved):
+            return self._update_tasks(
+                [delta.task_id],
+                project_id=delta.project_id,
+                project=delta.project,
+            )
+        elif isinstance(delta, TagsChanged):
+            return self._update_tasks(delta.task_ids, tag=delta.tag)
+        elif isinstance(delta, ProjectRenamed):
+            ids = [
+                task_id
+                for task_id, task in self.totals.items()
+                if task.project_id == delta.project_id
+            ]
+            return self._update_tasks(ids, project=delta.name)
+        elif isinstance(delta, SessionsDeleted):
+            return self._delete_tasks(delta.task_ids)
+        return set()
+
+    def _add_session(self, delta: SessionAdded) -> set[TimeInterval]:
+        intervals = {
+            ti
+            for ti in self.intervals
+            if (self.since[ti] or "") <= delta.date <= self.today
+        }
+        if not intervals or not delta.duration:
+            return set()
+        if delta.task_id not in self.totals:
+            row = db.fetch_task_info(delta.task_id)
+            zeros = (0 for _ in self.intervals)
+            self.totals[delta.task_id] = TaskTotals(
+                (*row, *zeros), self.intervals
+            )
+        task = self.totals[delta.task_id]
+        for ti in intervals:
+            task.time[ti] += delta.duration
+        return intervals
+
+    def _update_tasks(self, task_ids: list[int], **attrs) -> set[TimeInterval]:
+        changed: set[TimeInterval] = set()
+        for task_id in task_ids:
+            task = self.totals.get(task_id)
+            if task:
+                for attr, value in attrs.items():
+                    setattr(task, attr, value)
+                changed |= task.intervals
+        return changed
+
+    def _delete_tasks(self, task_ids: list[int]) -> set[TimeInterval]:
+        changed: set[TimeInterval] = set()
+        for task_id in task_ids:
+            task = self.totals.pop(task_id, None)
+            if task:
+                changed |= task.intervals
+        return changed
+
+    def _rollup(self, ti: TimeInterval) -> None:
+        projects: dict[int, list] = dict()
+        tags: dict[str, int] = dict()
+        tasks = []
+        for task in self.totals.values():
+            time = task.time[ti]
+            if not time:
+                continue
+            tasks.append((task.name, time, task.project))
+            projects.setdefault(task.project_id, [task.project, 0])[1] += time
+            if task.tag is not None:
+                tags[task.tag] = tags.get(task.tag, 0) + time
+
+        self.tasks[ti] = _by_time_desc(tasks)
+        self.projects[ti] = _by_time_desc(map(tuple, projects.values()))
+        self.tags[ti] = _by_time_desc(tags.items())
+
+
+def _by_time_desc(rows) -> list[tuple]:
+    return sorted(rows, key=lambda row: row[1], reverse=True)
@@ -1,9 +1,11 @@
+from datetime import datetime
+
 from textual.reactive import watch
 from textual.views._grid_view import GridView
 
-from .. import db
+from .. import db, worker
 from ..config import config
-from ..events import DbUpdate
+from ..events import DbUpdate, SessionAdded
 from ..stopwatch import sec_to_str
 from ..widgets.current_task import CurrentTask
 from ..widgets.header import MyHeader
@@ -14,6 +16,9 @@ from ..widgets.timer import Timer
 
 
 class MainView(GridView):
+
+    _recovered: tuple[int, datetime, datetime] | None = None
+
     def __init__(self, name: str | None = "MainView") -> None:
         super().__init__(name=name)
         self._init_widgets()
@@ -38,9 +43,14 @@ class MainView(GridView):
     async def on_focus(self) -> None:
         await self.tasklist.focus()
 
-    def on_mount(self) -> None:
+    async def on_mount(self) -> None:
         self._place_widgets()
         watch(self.tasklist, "current_task", self.start_task)
+        watch(self.timer, "elapsed", self.tasklist.set_running_time)
+        self.set_interval(
+            config.database["checkpoint_interval"], self._checkpoint
+        )
+        await self._recover_session()
 
     def _place_widgets(self) -> None:
         self.grid.add_areas(
@@ -62,6 +72,8 @@ class MainView(GridView):
         if not current_task:
             self.current_task.clear_content()
         else:
+            if self._recovered:
+                await self._save_recovered()
             self.set_current_task(current_task)
             self.start_session()
 
@@ -70,64 +82,133 @@ class MainView(GridView):
 
     def start_session(self) -> None:
         self.timer.start()
+        worker.submit(
+            db.open_session,
+            self.tasklist.current_task.id,
+            _timestamp(self.timer.start_time),
+        )
         ialogger.update("Running")
 
+    def _checkpoint(self) -> None:
+        if self.timer.working:
+            worker.submit(
+                db.checkpoint_open_session, _timestamp(datetime.now())
+            )
+
+    async def _recover_session(self) -> None:
+        """Offers to save or discard the session left open by a crash,
+        it ends at its last checkpoint"""
+        row = await worker.run(db.fetch_open_session)
+        if row is None:
+            return
+        task_id, start, checkpoint = row
+        start = datetime.fromisoformat(start)
+        end = datetime.fromisoformat(checkpoint)
+        self._recovered = (task_id, start, end)
+        task = await worker.run(db.fetch_task_info, task_id)
+        hl = config.styles["LOGGER_HIGHLIGHT"]
+        ialogger.update(
+            "[b]Unfinished session[/]\n"
+            f"[{hl}]{task[1]}[/] - {sec_to_str((end - start).seconds)}\n"
+            f"[{hl}]{config.app_keys['save_session']}[/] - save, "
+            f"[{hl}]{config.app_keys['discard_session']}[/] - discard"
+        )
+
+    async def _save_recovered(self) -> None:
+        task_id, start, end = self._recovered
+        self._recovered = None
+        if end <= start:
+            worker.submit(db.delete_open_session)
+            return
+        deltas = self._close_session(task_id, start, end)
+        duration = sum(d.duration for d in deltas)
+        self.tasklist.add_task_time(task_id, duration)
+        await self.app.post_message_from_child(DbUpdate(self, *deltas))
+        ialogger.update(
+            f"[b]Unfinished session saved[/]\n{sec_to_str(duration)}"
+        )
+
     async def save_data(self) -> None:
+        if self._recovered and not self.timer.working:
+            await self._save_recovered()
+            return
+
         self.timer.stop()
         if self.timer.saved_time.seconds and self.tasklist.current_task:
-            if self.timer.end_time.date() > self.timer.start_time.date():
-                self._split_session_and_save()
-            else:
-                self._save_session()
-            await self.app.post_message_from_child(DbUpdate(self))
+            deltas = self._close_session(
+                self.tasklist.current_task.id,
+                self.timer.start_time,
+                self.timer.end_time,
+            )
+            self.tasklist.add_time(sum(d.duration for d in deltas))
+            await self.app.post_message_from_child(DbUpdate(self, *deltas))
             hl = config.styles["LOGGER_HIGHLIGHT"]
             ialogger.update(
                 "[b]Session saved[/]\n"
                 f"[{hl}]{self.current_task.content}[/] - "
                 f"{sec_to_str(self.timer.saved_time.seconds)}"
             )
+        else:
+            worker.submit(db.delete_open_session)
         self.tasklist.current_task = None
         self.timer.restart()
 
-    def _split_session_and_save(self) -> None:
-        end_of_first_day = self.timer.start_time.replace(
-            hour=23, minute=59, second=59
-        )
-        duration1 = (end_of_first_day - self.timer.start_time).seconds + 1
-        db.add_session(
-            self.tasklist.current_task.id,
-            self.timer.start_time.strftime("%Y-%m-%d"),
-            self.timer.start_time.strftime("%H:%M:%S"),
-            end_of_first_day.strftime("%H:%M:%S"),
-            duration1,
-        )
-        self.tasklist.add_time(duration1)
-
-        start_of_second_day = self.timer.end_time.replace(
-            hour=0, minute=0, second=0
-        )
-        duration2 = (self.timer.end_time - start_of_second_day).seconds
-        db.add_session(
-            self.tasklist.current_task.id,
-            self.timer.end_time.strftime("%Y-%m-%d"),
-            start_of_second_day.strftime("%H:%M:%S"),
-            self.timer.end_time.strftime("%H:%M:%S"),
-            duration2,
-        )
-        self.tasklist.add_time(duration2)
-
-    def _save_session(self) -> None:
-        db.add_session(
-            self.tasklist.current_task.id,
-            self.timer.start_time.strftime("%Y-%m-%d"),
-            self.timer.start_time.strftime("%H:%M:%S"),
-            self.timer.end_time.strftime("%H:%M:%S"),
-            self.timer.saved_time.seconds,
-        )
-        self.tasklist.add_time(self.timer.saved_time.seconds)
+    def _close_session(
+        self, task_id: int, start: datetime, end: datetime
+    ) -> list[SessionAdded]:
+        """Submits the session, split at midnight, in place of the open
+        one and returns the deltas"""
+        sessions = _split_session(task_id, start, end)
+        worker.submit(db.close_open_session, sessions)
+        return [SessionAdded(s[0], s[1], s[4]) for s in sessions]
 
     def discard_session(self) -> None:
         if self.timer._working:
+            worker.submit(db.delete_open_session)
             self.timer.restart()
             self.tasklist.current_task = None
             ialogger.update("Session discarded. Timer reset.")
+        elif self._recovered:
+            worker.submit(db.delete_open_session)
+            self._recovered = None
+            ialogger.update("Unfinished session discarded.")
+
+
+def _split_session(
+    task_id: int, start: datetime, end: datetime
+) -> list[tuple]:
+    """Returns task_id|date|start_time|end_time|duration rows, a session
+    crossing midnight is split in two"""
+    if end.date() == start.date():
+        return [
+            (
+                task_id,
+                start.strftime("%Y-%m-%d"),
+                start.strftime("%H:%M:%S"),
+                end.strftime("%H:%M:%S"),
+                (end - start).seconds,
+            )
+        ]
+
+    end_of_first_day = start.replace(hour=23, minute=59, second=59)
+    start_of_second_day = end.replace(hour=0, minute=0, second=0)
+    return [
+        (
+            task_id,
+            start.strftime("%Y-%m-%d"),
+            start.strftime("%H:%M:%S"),
+            end_of_first_day.strftime("%H:%M:%S"),
+            (end_of_first_day - start).seconds + 1,
+        ),
+        (
+            task_id,
+            end.strftime("%Y-%m-%d"),
+            start_of_second_day.strftime("%H:%M:%S"),
+            end.strftime("%H:%M:%S"),
+            (end - start_of_second_day).seconds,
+        ),
+    ]
+
+
+def _timestamp(moment: datetime) -> str:
+    return moment.strftime("%Y-%m-%d %H:%M:%S")
@@ -1,39 +1,53 @@
-from typing import Literal
+import asyncio
+import sqlite3
 
 from rich.panel import Panel
 from rich.table import Table
+from rich.text import Text
 from textual import events
 from textual.views._grid_view import GridView
 
-from .. import db
+from .. import worker
 from ..config import config
+from ..events import Delta
+from ..stats import INTERVALS, Stats, TimeInterval
 from ..stopwatch import sec_to_str
+from ..widgets.in_app_logger import ialogger
 from ..widgets.simple_scrollview import SimpleScrollView
 
 
-TimeInterval = Literal["today", "week", "month"]
-
 SSS = config.styles["STATS_SUBHEADERS_STYLE"]
 SPS = config.styles["STATS_PROJECTS_STYLE"]
 
+COLUMNS = ("left", "center", "right")
+
 
 class StatsView(GridView):
-    _show_project: bool = False
-    _focused: SimpleScrollView | None = None
-    _need_update: bool = False
+    """Shows a section for every interval from the config, three sections
+    per page.
+
+    The data is collected in the db thread on the first focus, sections
+    show a placeholder until it arrives"""
 
-    today: SimpleScrollView
-    week: SimpleScrollView
-    month: SimpleScrollView
+    _show_project: bool = False
+    _focused: int = 0
+    _loaded: bool = False
+    _loading: asyncio.Task | None = None
+    _generation: int = 0
 
-    projects: dict[TimeInterval, list[tuple]] = dict()
-    tasks: dict[TimeInterval, list[tuple]] = dict()
-    tags: dict[TimeInterval, list[tuple]] = dict()
+    sections: dict[TimeInterval, SimpleScrollView]
 
     def __init__(self, name: str | None = "StatsView") -> None:
         super().__init__(name=name)
+        self.stats = Stats(config.stats["intervals"])
+        if self.stats.unknown_intervals:
+            ialogger.update(
+                "[red]Unknown stats intervals[/]\n"
+                + ", ".join(self.stats.unknown_intervals),
+                error=True,
+            )
+        self._outdated: set[TimeInterval] = set()
         self._make_view_grid()
-        self._collect_data()
         self._init_widgets()
 
     def _make_view_grid(self) -> None:
@@ -42,47 +56,57 @@ class StatsView(GridView):
         self.grid.add_column("right", fraction=1)
         self.grid.add_row("row")
 
-    def _collect_data(self) -> None:
-        self.projects["today"] = db.fetch_projects_today()
-        self.projects["week"] = db.fetch_projects_week()
-        self.projects["month"] = db.fetch_projects_month()
-        self.tasks["today"] = db.fetch_tasks_today()
-        self.tasks["week"] = db.fetch_tasks_week()
-        self.tasks["month"] = db.fetch_tasks_month()
-        self.tags["today"] = db.fetch_tags_today()
-        self.tags["week"] = db.fetch_tags_week()
-        self.tags["month"] = db.fetch_tags_month()
-
-    def _init_widgets(self) -> None:
-        self.today = SimpleScrollView(self._get_today_section())
-        self.week = SimpleScrollView(self._get_week_section())
-        self.month = SimpleScrollView(self._get_month_section())
-
-    def _get_today_section(self) -> Panel:
-        grid = self._get_section_grid()
-        self._fill_grid(grid, "today")
-        return Panel(
-            grid,
-            title="Today",
-            border_style=config.styles["STATS_TODAY_BORDER_STYLE"],
+    def _load(self) -> None:
+        """Starts collecting the data. Loads started earlier are
+        superseded, the ones still queued in the db thread return without
+        running the query"""
+        self._generation += 1
+        self._loading = asyncio.create_task(
+            self._collect_data(self._generation)
         )
 
-    def _get_week_section(self) -> Panel:
-        grid = self._get_section_grid()
-        self._fill_grid(grid, "week")
-        return Panel(
-            grid,
-            title="Last 7 days",
-            border_style=config.styles["STATS_WEEK_BORDER_STYLE"],
-        )
+    async def _collect_data(self, generation: int) -> None:
+        try:
+            collected = await worker.run(self._collect, generation)
+        except sqlite3.Error as e:
+            worker.report_error(e)
+            return
+        finally:
+            if generation == self._generation:
+                self._loading = None
+        if not collected or generation != self._generation:
+            return
+        self._loaded = True
+        self._outdated = set(self.stats.intervals)
+        if self.app.current_view is self:
+            await self._rerender_outdated()
+
+    def _collect(self, generation: int) -> bool:
+        """Runs in the db thread"""
+        if generation != self._generation:
+            return False
+        self.stats.collect()
+        return True
 
-    def _get_month_section(self) -> Panel:
-        grid = self._get_section_grid()
-        self._fill_grid(grid, "month")
+    def _init_widgets(self) -> None:
+        self.sections = {
+            ti: SimpleScrollView(self._get_section(ti))
+            for ti in self.stats.intervals
+        }
+
+    def _get_section(self, ti: TimeInterval) -> Panel:
+        if self._loaded:
+            content = self._get_section_grid()
+            self._fill_grid(content, ti)
+        else:
+            content = Text("Loading...", style=SSS)
         return Panel(
-            grid,
-            title="Last 30 days",
-            border_style=config.styles["STATS_MONTH_BORDER_STYLE"],
+            content,
+            title=INTERVALS[ti].title,
+            border_style=config.styles.get(
+                f"STATS_{ti.upper()}_BORDER_STYLE",
+                config.styles["STATS_NORMAL_TEXT"],
+            ),
         )
 
     def _get_section_grid(self) -> Table:
@@ -99,13 +123,13 @@ class StatsView(GridView):
 
     def _insert_projects(self, grid: Table, ti: TimeInterval) -> None:
         grid.add_row(f"[{SSS}]Projects:")
-        for row in self.projects[ti]:
+        for row in self.stats.projects[ti]:
             grid.add_row(row[0], sec_to_str(row[1]))
         grid.add_row(end_section=True)
 
     def _insert_tasks(self, grid: Table, ti: TimeInterval) -> None:
         grid.add_row(f"[{SSS}]Tasks:")
-        for row in self.tasks[ti]:
+        for row in self.stats.tasks[ti]:
             task = (
                 f"{row[0]} -> [{SPS}]{row[2]}[/]"
                 if self._show_project
@@ -116,7 +140,7 @@ class StatsView(GridView):
 
     def _insert_tags(self, grid: Table, ti: TimeInterval) -> None:
         grid.add_row(f"[{SSS}]Tags:")
-        for row in self.tags[ti]:
+        for row in self.stats.tags[ti]:
             grid.add_row(row[0], sec_to_str(row[1]))
 
     async def on_mount(self) -> None:
@@ -128,59 +152,82 @@ class StatsView(GridView):
             center="center,row",
             right="right,row",
         )
-        self.grid.place(
-            left=self.today,
-            center=self.week,
-            right=self.month,
-        )
-
-    async def _update(self) -> None:
-        self._collect_data()
-        await self._rerender()
-
-    async def _rerender(self) -> None:
-        await self.today.update(self._get_today_section())
-        await self.week.update(self._get_week_section())
-        await self.month.update(self._get_month_section())
+        for idx, section in enumerate(self.sections.values()):
+            self.grid.place(**{COLUMNS[idx % len(COLUMNS)]: section})
+        self._show_page()
+
+    def _show_page(self) -> None:
+        page = self._focused // len(COLUMNS)
+        for idx, section in enumerate(self.sections.values()):
+            section.visible = idx // len(COLUMNS) == page
+
+    @property
+    def focused_section(self) -> SimpleScrollView | None:
+        sections = list(self.sections.values())
+        return sections[self._focused] if sections else None
+
+    async def _rerender(self, intervals=None) -> None:
+        """Sections of other pages are rerendered when they are shown"""
+        for ti, section in self.sections.items():
+            if intervals is None or ti in intervals:
+                if section.visible:
+                    await section.update(self._get_section(ti))
+                else:
+                    self._outdated.add(ti)
+
+    async def _rerender_outdated(self) -> None:
+        outdated, self._outdated = self._outdated, set()
+        await self._rerender(outdated)
 
     async def on_focus(self) -> None:
-        if not self._focused:
-            self._focused = self.today
-        await self._focused.focus()
-        if self._need_update:
-            await self._update()
-            self._need_update = False
+        if self.focused_section:
+            await self.focused_section.focus()
+        if not self._loaded:
+            if not self._loading:
+                self._load()
+            return
+        if self.stats.stale:
+            self._outdated |= await worker.run(self.stats.apply, ())
+        if self._outdated:
+            await self._rerender_outdated()
 
     async def on_key(self, event: events.Key) -> None:
         if event.key == config.stats_keys["toggle_projects_after_task"]:
             self._show_project = not self._show_project
-            await self._update()
+            await self._rerender()
         elif event.key in ["left", config.stats_keys["left"]]:
             await self._focus_left()
         elif event.key in ["right", config.stats_keys["right"]]:
             await self._focus_right()
         elif event.key in ["down", config.stats_keys["down"]]:
-            if self._focused:
-                self._focused.page_down()
+            if self.focused_section:
+                self.focused_section.page_down()
         elif event.key in ["up", config.stats_keys["up"]]:
-            if self._focused:
-                self._focused.page_up()
+            if self.focused_section:
+                self.focused_section.page_up()
 
     async def _focus_left(self) -> None:
-        if self._focused is None:
-            self._focused = self.month
-        elif self._focused == self.month:
-            self._focused = self.week
-        elif self._focused == self.week:
-            self._focused = self.today
+        if self._focused > 0:
+            self._focused -= 1
+            self._show_page()
+            await self._rerender_outdated()
 
     async def _focus_right(self) -> None:
-        if self._focused is None:
-            self._focused = self.today
-        elif self._focused == self.today:
-            self._focused = self.week
-        elif self._focused == self.week:
-            self._focused = self.month
-
-    def require_update(self) -> None:
-        self._need_update = True
+        if self._focused < len(self.sections) - 1:
+            self._focused += 1
+            self._show_page()
+            await self._rerender_outdated()
+
+    def require_update(self, *deltas: Delta) -> None:
+        """Queues deltas to be applied to the collected data in the db
+        thread, after the writes they come from, without waiting for
+        them. Panels that have changed are rerendered on the next focus.
+        A load in flight may miss the writes, so it is started again"""
+        if not self._loaded:
+            if self._loading:
+                self._load()
+            return
+        worker.submit(self.stats.apply, deltas, on_result=self._mark_outdated)
+
+    def _mark_outdated(self, intervals: set[TimeInterval]) -> None:
+        self._outdated |= intervals
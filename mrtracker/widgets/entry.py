@@ -1,27 +1,22 @@
-from textual.reactive import events
+class Entry:
+    """Data of a task or project row. Rows are edited with the text input
+    shared by the whole task list, so entries are plain records"""
 
-from .text_input import TextInput
+    __slots__ = ("_id", "_project_id", "_title", "_time", "_tag")
 
-
-class Entry(TextInput):
-
-    _id: int
+    _id: int | None
     _project_id: int | None
     _title: str
     _time: int
     _tag: str | None
 
     def __init__(self, data: tuple) -> None:
-        super().__init__()
         self._id = data[0]
         self._project_id = data[1]
         self._title = data[2]
         self._time = data[3] if data[3] else 0
         self._tag = data[4]
 
-    def on_key(self, event: events.Key) -> None:
-        super().on_key(event)
-
     @property
     def id(self) -> int:
         return self._id
@@ -67,5 +62,6 @@ class Entry(TextInput):
         self._tag = new_tag if new_tag else None
 
 
-def generate_entry(entry_id: int, project_id: int | None) -> Entry:
-    return Entry((entry_id, project_id, "", 0, None))
+def generate_entry(project_id: int | None) -> Entry:
+    """The id is None until the entry is inserted into db"""
+    return Entry((None, project_id, "", 0, None))
@@ -1,10 +1,68 @@
+from typing import Any, Hashable, Iterable, Iterator
+
+from rich.cells import cell_len
+from rich.console import Console, ConsoleOptions, RenderResult
 from rich.padding import PaddingDimensions
+from rich.segment import Segment
 from rich.text import TextType
+from rich.tree import Tree
 from textual.app import events
 from textual.widgets import NodeID, TreeControl, TreeNode
 
 
+OVERSCAN = 20
+
+Line = list[Segment]
+
+
+class NestedNode(TreeNode):
+    """TreeNode that knows its position among the siblings"""
+
+    index: int = 0
+
+    async def expand(self, expanded: bool = True) -> None:
+        self.set_expanded(expanded)
+        self._control.refresh(layout=True)
+
+    def set_expanded(self, expanded: bool) -> None:
+        """Expands without refreshing the control, children queued with
+        add_lazy are created on the first expand"""
+        if expanded:
+            self._control.load_children(self)
+        self._expanded = expanded
+        self._tree.expanded = expanded
+
+    @property
+    def next_sibling(self) -> TreeNode | None:
+        if self.parent is None:
+            return None
+        siblings = self.parent.children
+        if self.index + 1 < len(siblings):
+            return siblings[self.index + 1]
+        return None
+
+    @property
+    def previous_sibling(self) -> TreeNode | None:
+        if self.parent is None or not self.index:
+            return None
+        return self.parent.children[self.index - 1]
+
+
 class NestedList(TreeControl):
+    """Tree that renders only the rows around the viewport of its scroll
+    view, every row takes exactly one line.
+
+    Rendered rows are memoized per node, a row is rendered again only when
+    the key returned by row_key changes.
+
+    Nodes keep their positions among the siblings, so swapping and moving
+    don't search the children. Node ids are never reused.
+
+    Children added with add_lazy are kept as (label, data) pairs until
+    their parent is expanded, collapsed nodes cost no tree nodes"""
+
+    rows_top: int = 0
+
     def __init__(
         self,
         label: TextType,
@@ -14,6 +72,177 @@ class NestedList(TreeControl):
     ) -> None:
         super().__init__(label, data, name=name, padding=padding)
         self.show_cursor = True
+        self._viewport = (0, 0)
+        self._rendered_rows = (0, 0)
+        self._row_cache: dict[NodeID, tuple[Hashable, Line]] = dict()
+        self._rendered_ids: set[NodeID] = set()
+        self._pending: dict[NodeID, list[tuple[TextType, Any]]] = dict()
+
+    def set_viewport(self, top: int, height: int) -> None:
+        """Sets lines shown by the scroll view, the list is rendered
+        again only if they aren't covered by the rendered rows"""
+        self._viewport = (top, height)
+        start, end = self._rendered_rows
+        first = top - self.rows_top
+        if first < start or first + height > end:
+            self.refresh()
+
+    def is_rendered(self, node: TreeNode) -> bool:
+        """True if the node's row was drawn by the last render"""
+        return node.id in self._rendered_ids
+
+    def row_key(self, node: TreeNode) -> Hashable:
+        """Everything the rendered row depends on, None disables caching"""
+        return None
+
+    def iter_rows(self) -> Iterator[tuple[TreeNode, str]]:
+        """Yields shown nodes in display order with their guides"""
+        if self._tree.hide_root:
+            yield from self._iter_children(self.root, "", guides=False)
+        else:
+            yield self.root, ""
+            yield from self._iter_children(self.root, "", guides=True)
+
+    def _iter_children(
+        self, node: TreeNode, prefix: str, guides: bool
+    ) -> Iterator[tuple[TreeNode, str]]:
+        if not node.expanded:
+            return
+        last = len(node.children) - 1
+        for i, child in enumerate(node.children):
+            if guides:
+                yield child, prefix + ("└── " if i == last else "├── ")
+                child_prefix = prefix + ("    " if i == last else "│   ")
+            else:
+                yield child, prefix
+                child_prefix = prefix
+            yield from self._iter_children(child, child_prefix, guides=True)
+
+    def render_rows(self) -> "_Rows":
+        top, height = self._viewport
+        if height:
+            first = top - self.rows_top
+            self._rendered_rows = (first - OVERSCAN, first + height + OVERSCAN)
+        else:
+            self._rendered_rows = (0, len(self.nodes))
+        self._rendered_ids = set()
+        return _Rows(self, *self._rendered_rows)
+
+    def render(self) -> "_Rows":
+        return self.render_rows()
+
+    def _render_row(
+        self,
+        console: Console,
+        options: ConsoleOptions,
+        node: TreeNode,
+        guide: str,
+    ) -> Line:
+        key = self.row_key(node)
+        if key is not None:
+            key = (key, guide, options.max_width)
+            cached = self._row_cache.get(node.id)
+            if cached and cached[0] == key:
+                return cached[1]
+
+        width = options.max_width - cell_len(guide)
+        line = console.render_lines(
+            self.render_node(node),
+            options.update(width=width, height=1),
+            pad=False,
+        )[0]
+        line = [Segment(guide, console.get_style("tree.line")), *line]
+        if key is not None:
+            self._row_cache[node.id] = (key, line)
+        return line
+
+    async def add(self, node_id: NodeID, label: TextType, data) -> None:
+        """Rows are rendered by NestedList itself, so unlike TreeControl.add
+        the nodes' rich trees are left detached. Queued children of the
+        parent are created first, so the node stays the last one"""
+        parent = self.nodes[node_id]
+        self.load_children(parent)
+        self._add_node(parent, label, data)
+        self.refresh(layout=True)
+
+    def add_children(
+        self, node_id: NodeID, children: Iterable[tuple[TextType, Any]]
+    ) -> list[NodeID]:
+        """Adds (label, data) pairs in one pass with a single refresh and
+        returns ids of the new nodes in the same order. Node ids only
+        identify nodes, callers map their own ids to them"""
+        parent = self.nodes[node_id]
+        self.load_children(parent)
+        ids = []
+        for label, data in children:
+            self._add_node(parent, label, data)
+            ids.append(self.id)
+        self.refresh(layout=True)
+        return ids
+
+    def _add_node(self, parent: TreeNode, label: TextType, data) -> None:
+        self.id = NodeID(self.id + 1)
+        node = NestedNode(parent, self.id, self, Tree(label), label, data)
+        node.index = len(parent.children)
+        parent.children.append(node)
+        self.nodes[self.id] = node
+
+    def add_lazy(self, node_id: NodeID, label: TextType, data) -> None:
+        """Queues a child that is created when its parent is expanded"""
+        self._pending.setdefault(node_id, []).append((label, data))
+
+    def load_children(self, node: TreeNode) -> None:
+        """Creates the queued children of the node"""
+        for label, data in self._pending.pop(node.id, ()):
+            self._add_node(node, label, data)
+
+    def child_count(self, node: TreeNode) -> int:
+        return len(node.children) + len(self._pending.get(node.id, ()))
+
+    def iter_children_data(self, node: TreeNode) -> Iterator[Any]:
+        """Data of the created and the queued children"""
+        for child in node.children:
+            yield child.data
+        for _, data in self._pending.get(node.id, ()):
+            yield data
+
+    def expand_nodes(
+        self, nodes: Iterable[NestedNode], expanded: bool
+    ) -> None:
+        """Expands or collapses the nodes with a single relayout"""
+        for node in nodes:
+            node.set_expanded(expanded)
+        self.refresh(layout=True)
+
+    def swap_nodes(self, one: NestedNode, two: NestedNode) -> None:
+        """Swaps positions of two siblings"""
+        siblings = one.parent.children
+        siblings[one.index], siblings[two.index] = two, one
+        one.index, two.index = two.index, one.index
+        self.refresh(layout=True)
+
+    def move_node(self, node: NestedNode, new_parent: TreeNode) -> None:
+        """Moves node to the end of new parent's children"""
+        self.load_children(new_parent)
+        self._detach(node)
+        node.parent = new_parent
+        node.index = len(new_parent.children)
+        new_parent.children.append(node)
+        self.refresh(layout=True)
+
+    def _detach(self, node: NestedNode) -> None:
+        """Only the siblings after the node are renumbered"""
+        siblings = node.parent.children
+        del siblings[node.index]
+        for index in range(node.index, len(siblings)):
+            siblings[index].index = index
+
+    def _iter_subtree(self, node: TreeNode) -> Iterator[TreeNode]:
+        stack = [node]
+        while stack:
+            node = stack.pop()
+            yield node
+            stack.extend(node.children)
 
     async def add_child(self, label: TextType, data) -> None:
         await self.add(self.cursor, label=label, data=data)
@@ -37,16 +266,17 @@ class NestedList(TreeControl):
         if node is self.root:
             return
 
-        for nd in node.children:
-            await self.remove_node(nd)
-
-        if node.id == self.cursor:
+        subtree = list(self._iter_subtree(node))
+        if any(nd.id == self.cursor for nd in subtree):
+            self.cursor = node.id
             await self.cursor_up()
 
-        node.parent.tree.children.remove(node.tree)
-        node.parent.children.remove(node)
-        del self.nodes[node.id]
-        self.id = max(self.nodes.keys())
+        self._detach(node)
+        for nd in subtree:
+            del self.nodes[nd.id]
+            self._row_cache.pop(nd.id, None)
+            self._pending.pop(nd.id, None)
+        self.refresh(layout=True)
 
     def _cur_to_latest_child(self) -> None:
         self.cursor = self.id
@@ -80,3 +310,24 @@ class NestedList(TreeControl):
 
     async def key_enter(self, event: events.Key) -> None:
         pass
+
+
+class _Rows:
+    """Renders rows from start to end, other rows are left blank"""
+
+    def __init__(self, control: NestedList, start: int, end: int) -> None:
+        self.control = control
+        self.start = start
+        self.end = end
+
+    def __rich_console__(
+        self, console: Console, options: ConsoleOptions
+    ) -> RenderResult:
+        new_line = Segment.line()
+        for i, (node, guide) in enumerate(self.control.iter_rows()):
+            if self.start <= i < self.end:
+                self.control._rendered_ids.add(node.id)
+                yield from self.control._render_row(
+                    console, options, node, guide
+                )
+            yield new_line
@@ -2,11 +2,17 @@ from rich.console import RenderableType
 from textual.message import Message
 from textual.widgets import ScrollView
 
+from .nested_list import NestedList
+
 
 class SimpleScrollView(ScrollView):
     async def update(self, content: RenderableType) -> None:
         await super().update(content)
 
+    async def watch_y(self, new_value: float) -> None:
+        await super().watch_y(new_value)
+        self._update_viewport()
+
     async def handle_window_change(self, message: Message) -> None:
         message.stop()
 
@@ -20,6 +26,12 @@ class SimpleScrollView(ScrollView):
         self.hscroll.window_size = width
         self.vscroll.virtual_size = virtual_height
         self.vscroll.window_size = height
+        self._update_viewport()
+
+    def _update_viewport(self) -> None:
+        """Lets nested lists render only the rows that can be seen"""
+        if isinstance(self.window.widget, NestedList):
+            self.window.widget.set_viewport(round(self.y), self.size.height)
 
     async def key_down(self) -> None:
         pass
@@ -1,4 +1,5 @@
-from sqlite3 import IntegrityError
+import sqlite3
+from typing import Callable, Hashable
 
 from rich.console import RenderableType
 from rich.padding import PaddingDimensions
@@ -8,14 +9,23 @@ from rich.text import Text, TextType
 from textual.reactive import Reactive, events
 from textual.widgets import NodeID, TreeNode
 
-from .. import db
-from ..config import config
-from ..events import DbUpdate
+from .. import db, worker
+from ..config import DEBUG, config
+from ..events import (
+    Delta,
+    DbUpdate,
+    ProjectRenamed,
+    SessionsDeleted,
+    TagsChanged,
+    TaskMoved,
+    TaskRenamed,
+)
 from ..mode import Action, Mode
 from ..stopwatch import sec_to_str
 from .entry import Entry, generate_entry
 from .in_app_logger import ialogger
 from .nested_list import NestedList
+from .text_input import TextInput
 
 
 HL = config.styles["LOGGER_HIGHLIGHT"]
@@ -40,8 +50,11 @@ class TaskList(NestedList):
     _mode: Reactive[Mode] = Reactive(Mode.NORMAL)
     _action: Action | None = None
     _mem: NodeID = NodeID(0)
+    _current_node: TreeNode | None = None
+    _running_time: int = 0
     _show_tags: Reactive[bool] = Reactive(False)
     _list_style: Reactive[int] = Reactive(config.styles["DEFAULT_FORMAT"])
+    rows_top = 1  # panel border
 
     def __init__(
         self,
@@ -52,15 +65,16 @@ class TaskList(NestedList):
     ) -> None:
         super().__init__(label=label, data=data, name=name, padding=padding)
         self._tree.hide_root = True
+        self._editor = TextInput()
 
     async def on_mount(self) -> None:
         await self.collect_data()
 
     async def collect_data(self) -> None:
-        self._projects = db.fetch_projects()
-        self._tasks = db.fetch_tasks()
+        projects = await worker.run(db.fetch_projects)
+        tasks = await worker.run(db.fetch_tasks)
         await self.add_header()
-        await self._build_tree()
+        self._build_tree(projects, tasks)
         await self.root.expand()
         self.sum_projects_time()
 
@@ -69,20 +83,44 @@ class TaskList(NestedList):
         await self.add(NodeID(0), "header", None)
         self.id = 0
 
-    async def _build_tree(self) -> None:
-        for row in self._projects:
-            self.id = row[0] - 1
-            await self.add(NodeID(0), row[1], Entry(row))
-
-        for row in self._tasks:
-            await self.add(row[1], row[2], Entry(row))
+    def _build_tree(self, projects: list[tuple], tasks: list[tuple]) -> None:
+        """Projects are added at once, tasks are queued until their project
+        is expanded. Tasks find their projects by db id through the map"""
+        node_ids = self.add_children(
+            NodeID(0), (("project", Entry(row)) for row in projects)
+        )
+        project_nodes = dict(zip((row[0] for row in projects), node_ids))
+        for row in tasks:
+            self.add_lazy(project_nodes[row[1]], "task", Entry(row))
 
     def sum_projects_time(self) -> None:
+        """Full recomputation, after that project totals are updated
+        incrementally by _add_projects_time"""
         for project in self.root.children[1:]:
             project.data.time = sum(
-                task.data.time for task in project.children
+                task.time for task in self.iter_children_data(project)
             )
 
+    def _add_projects_time(self, *changes: tuple[TreeNode, int]) -> None:
+        for project, time in changes:
+            project.data.time += time
+        if DEBUG:
+            self._verify_projects_time()
+
+    def _verify_projects_time(self) -> None:
+        """Compares project totals with the full recomputation"""
+        for project in self.root.children[1:]:
+            actual = sum(
+                task.time for task in self.iter_children_data(project)
+            )
+            if project.data.time != actual:
+                ialogger.update(
+                    f"[red]Project total mismatch[/] {project.data.title}: "
+                    f"{project.data.time} != {actual}",
+                    error=True,
+                )
+                project.data.time = actual
+
     async def on_focus(self) -> None:
         self._mode = Mode.NORMAL
 
@@ -144,8 +182,9 @@ class TaskList(NestedList):
         curr = self.nodes[self.cursor]
         if selected.parent is curr.parent:
             self._swap_entries()
+            deltas = ()
         elif selected.data.type == "task" and curr.data.type == "project":
-            self._change_project()
+            deltas = (self._change_project(),)
         else:
             ialogger.update(
                 f"Can't swap [{HL}]{selected.data.title}[/] ⮀ "
@@ -156,52 +195,34 @@ class TaskList(NestedList):
         self.cursor = self._selected if self._selected else self.cursor
         self._selected = None
         self._action = None
-        await self.app.post_message_from_child(DbUpdate(self))
+        if deltas:
+            await self.app.post_message_from_child(DbUpdate(self, *deltas))
         ialogger.update("[b]DONE[/]")
 
     def _swap_entries(self) -> None:
+        """Only positions are swapped, entries keep their ids"""
         one = self.nodes[self._selected]
         two = self.nodes[self.cursor]
-        self._swap_entry_ids(one.data, two.data)
-        self._swap_trees(one, two)
-        self._swap_nodes(one, two)
         if one.data.type == "task":
-            db.swap_tasks(one.data.id, two.data.id)
+            worker.submit(db.swap_tasks, one.data.id, two.data.id)
         else:
-            db.swap_projects(one.data.id, two.data.id)
-
-    def _swap_entry_ids(self, one: Entry, two: Entry) -> None:
-        one.data.id, two.data.id = two.data.id, one.data.id
+            worker.submit(db.swap_projects, one.data.id, two.data.id)
+        self.swap_nodes(one, two)
 
-    def _swap_nodes(self, one: TreeNode, two: TreeNode) -> None:
-        children = one.parent.children
-        idx1 = children.index(one)
-        idx2 = children.index(two)
-        children[idx1], children[idx2] = children[idx2], children[idx1]
-
-    def _swap_trees(self, one: TreeNode, two: TreeNode) -> None:
-        children = one.parent.tree.children
-        idx1 = children.index(one.tree)
-        idx2 = children.index(two.tree)
-        children[idx1], children[idx2] = children[idx2], children[idx1]
-
-    def _change_project(self) -> None:
+    def _change_project(self) -> Delta:
         selected_node = self.nodes[self._selected]
         curr_node = self.nodes[self.cursor]
-        self._move_to_new_parent(selected_node, curr_node)
+        worker.submit(
+            db.change_project, selected_node.data.id, curr_node.data.id
+        )
+        old_project = selected_node.parent
+        self.move_node(selected_node, curr_node)
         selected_node.data.project_id = curr_node.data.id
-        db.change_project(selected_node.data.id, curr_node.data.id)
-        self.sum_projects_time()
-
-    def _move_to_new_parent(self, node: TreeNode, new_par: TreeNode) -> None:
-        new_par.tree.children.append(node.tree)
-        node.parent.tree.children.remove(node.tree)
-
-        new_par.children.append(node)
-        node.parent.children.remove(node)
-
-        node.parent = new_par
-        node.data.parent_id = new_par.data.id
+        time = selected_node.data.time
+        self._add_projects_time((old_project, -time), (curr_node, time))
+        return TaskMoved(
+            selected_node.data.id, curr_node.data.id, curr_node.data.title
+        )
 
     def _handle_starting_task(self) -> None:
         if self.current_task:
@@ -211,6 +232,8 @@ class TaskList(NestedList):
             if entry.type == "project":
                 ialogger.update("Select task, not project", error=True)
             else:
+                self._current_node = self.nodes[self.cursor]
+                self._running_time = 0
                 self.current_task = entry
 
     async def go_down(self) -> None:
@@ -228,26 +251,26 @@ class TaskList(NestedList):
         if node.data.type == "project":
             await self.add_child(
                 "task",
-                generate_entry(db.get_next_task_id(), node.data.id),
+                generate_entry(node.data.id),
             )
         else:
             await self.add_sibling(
                 "task",
-                generate_entry(db.get_next_task_id(), node.parent.data.id),
+                generate_entry(node.parent.data.id),
             )
         self._action = Action.ADD
         self._mode = Mode.INSERT
-        node.data.clear_content()
+        self._editor.clear_content()
 
     async def add_project(self) -> None:
         self._mem = self.cursor
         await self.add_root_child(
             "project",
-            generate_entry(db.get_next_project_id(), None),
+            generate_entry(None),
         )
         self._action = Action.ADD
         self._mode = Mode.INSERT
-        self.nodes[self.cursor].data.clear_content()
+        self._editor.clear_content()
 
     def rename_entry(self) -> None:
         if not self._valid_cursor():
@@ -256,7 +279,7 @@ class TaskList(NestedList):
         self._action = Action.RENAME
         self._mode = Mode.INSERT
         entry = self.nodes[self.cursor].data
-        entry.content = entry.title
+        self._editor.content = entry.title
         ialogger.update(f"[b]Rename[/]\nType new name")
 
     def delete_entry(self) -> None:
@@ -266,7 +289,7 @@ class TaskList(NestedList):
         self._action = Action.DELETE
         self._mode = Mode.INSERT
         entry = self.nodes[self.cursor].data
-        entry.clear_content()
+        self._editor.clear_content()
         ialogger.update(
             f"Type [{HL}]'delete'[/] to delete [{HL}]{entry.title}[/]"
         )
@@ -278,7 +301,7 @@ class TaskList(NestedList):
         entry = self.nodes[self.cursor].data
         self._action = Action.RESET
         self._mode = Mode.INSERT
-        entry.clear_content()
+        self._editor.clear_content()
         ialogger.update(
             f"Type [{HL}]'reset'[/] to reset [{HL}]{entry.title}[/] time"
         )
@@ -297,7 +320,7 @@ class TaskList(NestedList):
         self._mem = self.cursor
         self._action = Action.ADD_TAG
         self._mode = Mode.INSERT
-        self.nodes[self.cursor].data.clear_content()
+        self._editor.clear_content()
         ialogger.update("Type new tag")
 
     def toggle_tags(self) -> None:
@@ -314,13 +337,14 @@ class TaskList(NestedList):
     async def toggle_all_projects(self) -> None:
         if not self._valid_cursor():
             return
-        for project in self.root.children:
-            await project.expand(not self.root.children[-1].expanded)
+        self.expand_nodes(
+            self.root.children[1:], not self.root.children[-1].expanded
+        )
         if self.nodes[self.cursor].data.type == "task":
             self._cur_to_parent()
 
     async def _handle_keypress_in_insert_mode(self, event: events.Key) -> None:
-        self.nodes[self.cursor].data.on_key(event)
+        self._editor.on_key(event)
         if event.key == "escape":
             await self._cancel()
         elif event.key == "enter":
@@ -341,97 +365,190 @@ class TaskList(NestedList):
 
     async def _handle_adding_entry(self) -> None:
         entry = self.nodes[self.cursor].data
-        if entry.content == entry.title == "":
+        if self._editor.content == entry.title == "":
             await self._cancel()
             return
 
-        entry.title = entry.content
+        entry.title = self._editor.content
         if entry.type == "project":
-            try:
-                db.add_project(entry.title)
-            except IntegrityError:
+            if self._project_exists(entry.title, entry):
                 ialogger.update(
                     "[red]ERROR[/]. "
                     + f"Project with name {entry.title} already exists",
                     error=True,
                 )
                 await self.remove_node()
+            else:
+                await self._insert_entry(db.add_project, entry.title)
 
         else:
-            db.add_task(entry.title, entry.project_id)
+            await self._insert_entry(
+                db.add_task, entry.title, entry.project_id
+            )
+
+    async def _insert_entry(self, insert: Callable[..., int], *args) -> None:
+        """The entry adopts the id assigned by the insert, so ids are never
+        guessed ahead of it. Entry that couldn't be inserted is removed"""
+        try:
+            self.nodes[self.cursor].data.id = await worker.run(insert, *args)
+        except sqlite3.Error as e:
+            worker.report_error(e)
+            await self.remove_node()
+
+    def _project_exists(self, name: str, entry: Entry) -> bool:
+        """Project names are unique, the check is done here so the write
+        can be submitted without waiting for it"""
+        return any(
+            project.data.title == name
+            for project in self.root.children[1:]
+            if project.data is not entry
+        )
 
     async def _handle_renaming_entry(self) -> None:
         entry = self.nodes[self.cursor].data
-        if not entry.content or entry.title == entry.content:
+        new_title = self._editor.content
+        if not new_title or entry.title == new_title:
             await self._cancel()
             return
+        if entry.type == "project" and self._project_exists(new_title, entry):
+            ialogger.update(
+                "[red]ERROR[/]. "
+                + f"Project with name {new_title} already exists",
+                error=True,
+            )
+            return
 
-        entry.title = entry.content
+        entry.title = new_title
         if entry.type == "project":
-            db.rename_project(entry.id, entry.title)
+            worker.submit(db.rename_project, entry.id, entry.title)
+            delta = ProjectRenamed(entry.id, entry.title)
         else:
-            db.rename_task(entry.id, entry.title)
+            worker.submit(db.rename_task, entry.id, entry.title)
+            delta = TaskRenamed(entry.id, entry.title)
+        await self.app.post_message_from_child(DbUpdate(self, delta))
         ialogger.update("[b]DONE[/]")
 
     async def _handle_deleting_entry(self) -> None:
         node = self.nodes[self.cursor]
         entry = node.data
-        if entry.content != "delete":
+        if self._editor.content != "delete":
             await self._cancel()
             return
 
         if entry.type == "project":
-            db.delete_project(entry.id)
+            task_ids = [task.id for task in self.iter_children_data(node)]
+            worker.submit(db.delete_project, entry.id)
         else:
-            db.delete_task(entry.id)
+            task_ids = [entry.id]
+            worker.submit(db.delete_task, entry.id)
         await self.remove_node()
+        if entry.type == "task":
+            self._add_projects_time((node.parent, -entry.time))
         await self.go_down()
-        self.sum_projects_time()
-        await self.app.post_message_from_child(DbUpdate(self))
+        await self.app.post_message_from_child(
+            DbUpdate(self, SessionsDeleted(task_ids))
+        )
         ialogger.update("[b]DONE[/]")
 
     async def _handle_resetting_task_time(self) -> None:
         node = self.nodes[self.cursor]
         entry = node.data
-        if entry.content != "reset":
+        if self._editor.content != "reset":
             await self._cancel()
             return
 
         if entry.type == "project":
-            db.delete_sessions_by_task_ids(
-                [child.data.id for child in node.children]
-            )
-            for t in node.children:
-                t.data.time = 0
+            task_ids = []
+            for task in self.iter_children_data(node):
+                task_ids.append(task.id)
+                task.time = 0
+            self._add_projects_time((node, -entry.time))
         else:
-            db.delete_sessions_by_task_ids([entry.id])
+            task_ids = [entry.id]
+            time = entry.time
             entry.time = 0
-        self.sum_projects_time()
-        await self.app.post_message_from_child(DbUpdate(self))
+            self._add_projects_time((node.parent, -time))
+        worker.submit(db.delete_sessions_by_task_ids, task_ids)
+        await self.app.post_message_from_child(
+            DbUpdate(self, SessionsDeleted(task_ids))
+        )
         ialogger.update("[b]DONE[/]")
 
     async def _handle_changing_tag(self) -> None:
         node = self.nodes[self.cursor]
         entry = node.data
-        new_tag = entry.content if entry.content else None
+        new_tag = self._editor.content or None
         task_ids = []
         if entry.type == "project":
-            for task_node in node.children:
-                task_node.data.tag = new_tag
-                task_ids.append(task_node.data.id)
+            for task in self.iter_children_data(node):
+                task.tag = new_tag
+                task_ids.append(task.id)
         else:
             entry.tag = new_tag
             task_ids.append(entry.id)
-        db.update_tags(task_ids, new_tag)
-        await self.app.post_message_from_child(DbUpdate(self))
+        worker.submit(db.update_tags, task_ids, new_tag)
+        await self.app.post_message_from_child(
+            DbUpdate(self, TagsChanged(task_ids, new_tag))
+        )
         ialogger.update("[b]DONE[/]")
 
     def add_time(self, time: int) -> None:
         self.current_task.time += time
-        self.sum_projects_time()
+        self._add_projects_time((self._current_node.parent, time))
+        self._running_time = 0
+
+    def add_task_time(self, task_id: int, time: int) -> None:
+        for node in self.root.children[1:]:
+            for task in self.iter_children_data(node):
+                if task.id == task_id:
+                    task.time += time
+                    self._add_projects_time((node, time))
+                    self.refresh()
+                    return
+
+    def set_running_time(self, seconds: int) -> None:
+        """Shows the running session on top of the stored times of the
+        current task and its project. Only their rows are rendered again
+        and nothing is repainted if neither of them is on the screen"""
+        if seconds == self._running_time:
+            return
+        self._running_time = seconds
+        node = self._current_node
+        if self.current_task and node:
+            if self.is_rendered(node) or self.is_rendered(node.parent):
+                self.refresh()
+
+    def _shown_time(self, node: TreeNode) -> int:
+        time = node.data.time
+        current = self._current_node
+        if self.current_task and current:
+            if node is current or node is current.parent:
+                time += self._running_time
+        return time
 
     def render(self) -> RenderableType:
-        return Panel(self._tree, border_style=config.styles["TASKLIST_BORDER"])
+        return Panel(
+            self.render_rows(), border_style=config.styles["TASKLIST_BORDER"]
+        )
+
+    def row_key(self, node: TreeNode) -> Hashable:
+        if node is self.root or node is self.root.children[0]:
+            return self._list_style
+        entry = node.data
+        key = (
+            self._list_style,
+            self._show_tags,
+            node.id == self.cursor,
+            node.id == self._selected,
+            node.expanded,
+            self.child_count(node),
+            entry.title,
+            self._shown_time(node),
+            entry.tag,
+        )
+        if node.id == self.cursor and self._mode is Mode.INSERT:
+            key += (self._editor.content, self._editor._cursor_pos)
+        return key
 
     def render_node(self, node: TreeNode) -> RenderableType:
         if node is self.root:
@@ -483,18 +600,18 @@ class TaskList(NestedList):
                 name = f"⇣ {name}"
             else:
                 name = f"→ {name}"
-                if node.children:
-                    name = f"{name} [{len(node.children)}]"
+                if count := self.child_count(node):
+                    name = f"{name} [{count}]"
         elif self._show_tags:
             name = f"{name} #{node.data.tag if node.data.tag else ''}"
-        name = Text(name)
+        name = Text(name, no_wrap=True, overflow="ellipsis")
         if cursor:
-            name = node.data._render_with_cursor()
+            name = self._editor._render_with_cursor()
         return name
 
     def _render_time(self, node: TreeNode) -> Text:
         justify = "right" if self._list_style == 3 else "left"
         return Text(
-            f" {sec_to_str(node.data.time)} ",
+            f" {sec_to_str(self._shown_time(node))} ",
             justify=justify,
         )
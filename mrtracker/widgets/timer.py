@@ -10,16 +10,36 @@ from ..config import config
 from ..stopwatch import Stopwatch, sec_to_str
 
 
+TICK_DELAY = 0.01
+
+
 class Timer(Widget, can_focus=False):
+    """Ticks only while the stopwatch is running, right after the shown
+    second changes, and repaints only if the shown time is different.
+
+    elapsed holds the shown seconds, so it can be watched to follow the
+    running session once per second"""
 
+    elapsed: Reactive[int] = Reactive(0)
     _working: Reactive[bool] = Reactive(False)
 
     def __init__(self, name: str | None = "Timer") -> None:
         super().__init__(name=name)
         self.stopwatch = Stopwatch()
+        self._ticks = 0
+
+    def _schedule_tick(self) -> None:
+        ticks = self._ticks
+        elapsed = self.stopwatch.elapsed_time.total_seconds()
+        delay = 1 - elapsed % 1 + TICK_DELAY
+
+        def tick() -> None:
+            # a restarted stopwatch has its own ticks
+            if ticks == self._ticks and self.stopwatch.on:
+                self.elapsed = self.stopwatch.elapsed_time.seconds
+                self._schedule_tick()
 
-    async def on_mount(self):
-        self.set_interval(0.5, self.refresh)
+        self.set_timer(delay, tick)
 
     @property
     def elapsed_time(self) -> timedelta:
@@ -49,15 +69,24 @@ class Timer(Widget, can_focus=False):
 
     def start(self) -> None:
         self.stopwatch.start()
+        self._working = True
+        self._ticks += 1
+        self._schedule_tick()
+        self.refresh()
 
     def stop(self) -> None:
         self.stopwatch.stop()
+        self._working = False
+        self.elapsed = 0
+        self.refresh()
 
     def restart(self):
         self.stopwatch.restart()
+        self._working = False
+        self.elapsed = 0
+        self.refresh()
 
     def render(self) -> RenderableType:
-        self._working = self.stopwatch.on
         self.panel = Panel(
             Align.center(
                 self.get_elapsed_time_str(),
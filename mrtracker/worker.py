@@ -0,0 +1,90 @@
+"""Single background thread for database calls.
+
+Textual handlers must not block the event loop, so the TUI doesn't call
+db functions directly. Writes are submitted and the UI goes on with its
+optimistic state, reads are awaited. Calls run one by one in the order
+they were made, so a read always sees the writes submitted before it.
+"""
+import asyncio
+from concurrent.futures import Future, ThreadPoolExecutor
+import functools
+from typing import Callable, TypeVar
+
+
+T = TypeVar("T")
+
+ErrorHandler = Callable[[BaseException], object]
+
+_executor: ThreadPoolExecutor | None = None
+_error_handler: ErrorHandler | None = None
+
+
+def set_error_handler(handler: ErrorHandler) -> None:
+    """Sets function called in the event loop with errors of submitted
+    calls"""
+    global _error_handler
+    _error_handler = handler
+
+
+def report_error(error: BaseException) -> None:
+    """Passes error of a call that was waited for to the error handler,
+    errors of submitted calls are passed automatically"""
+    if _error_handler is not None:
+        _error_handler(error)
+
+
+async def run(func: Callable[..., T], *args) -> T:
+    """Runs func in the db thread and waits for its result"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        _get_executor(), functools.partial(func, *args)
+    )
+
+
+def submit(
+    func: Callable[..., T],
+    *args,
+    on_result: Callable[[T], object] | None = None,
+) -> None:
+    """Queues func without waiting for it, on_result is called in the
+    event loop with its result"""
+    loop = asyncio.get_running_loop()
+    future = _get_executor().submit(func, *args)
+    future.add_done_callback(functools.partial(_report, loop, on_result))
+
+
+async def flush() -> None:
+    """Waits until all the queued calls are done"""
+    await run(_noop)
+
+
+def shutdown() -> None:
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=True)
+        _executor = None
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="mrtracker-db"
+        )
+    return _executor
+
+
+def _report(
+    loop: asyncio.AbstractEventLoop,
+    on_result: Callable | None,
+    future: Future,
+) -> None:
+    error = future.exception()
+    if error is not None:
+        loop.call_soon_threadsafe(report_error, error)
+    elif on_result is not None:
+        loop.call_soon_threadsafe(on_result, future.result())
+
+
+def _noop() -> None:
+    pass
@@ -0,0 +1,94 @@
+"""Shipped queries must not scan the sessions or daily totals tables.
+
+Every statement a db function runs is captured with the trace callback
+and planned again with EXPLAIN QUERY PLAN on a database made from
+createdb.sql.
+"""
+import os
+import re
+import sqlite3
+
+import pytest
+
+from mrtracker import db
+from mrtracker.config import ROOT_PKG_DIR
+
+
+FULL_SCAN = re.compile(r"^SCAN (TABLE )?(sessions|s|daily_task_totals|d)\b")
+
+DATE_RANGE = "USING PRIMARY KEY (date>? AND date<?)"
+
+
+@pytest.fixture
+def conn(tmp_path, monkeypatch):
+    conn = sqlite3.connect(tmp_path / "time.db")
+    with open(os.path.join(ROOT_PKG_DIR, "createdb.sql")) as file:
+        conn.executescript(file.read())
+    monkeypatch.setattr(db, "_conn", conn)
+    yield conn
+    conn.close()
+
+
+def query_plan(conn: sqlite3.Connection, func, *args) -> list[str]:
+    """Runs func and returns plan details of all the statements it ran"""
+    statements: list[str] = []
+    conn.set_trace_callback(statements.append)
+    try:
+        result = func(*args)
+        if not isinstance(result, list):
+            list(result)
+    finally:
+        conn.set_trace_callback(None)
+
+    assert statements
+    return [
+        row[3]
+        for sql in statements
+        for row in conn.execute("EXPLAIN QUERY PLAN " + sql)
+    ]
+
+
+def assert_no_full_scan(plan: list[str]) -> None:
+    scans = [detail for detail in plan if FULL_SCAN.match(detail)]
+    assert not scans, plan
+
+
+def uses(plan: list[str], index: str) -> bool:
+    return any(index in detail for detail in plan)
+
+
+def test_fetch_tasks(conn):
+    plan = query_plan(conn, db.fetch_tasks)
+    assert_no_full_scan(plan)
+    assert uses(plan, "daily_task_totals_task_id_idx"), plan
+
+
+@pytest.mark.parametrize(
+    "since",
+    [["2022-07-01"], ["2022-07-01", "2022-06-01", None], [None]],
+)
+def test_fetch_stats(conn, since):
+    plan = query_plan(conn, db.fetch_stats, since, "2022-07-31")
+    assert_no_full_scan(plan)
+    assert uses(plan, DATE_RANGE), plan
+
+
+@pytest.mark.parametrize("group_by", db.RANGE_GROUPS)
+@pytest.mark.parametrize(
+    "since, until", [("2022-07-01", "2022-07-31"), (None, "2022-07-31")]
+)
+def test_fetch_range(conn, since, until, group_by):
+    plan = query_plan(conn, db.fetch_range, since, until, group_by)
+    assert_no_full_scan(plan)
+    assert uses(plan, DATE_RANGE), plan
+
+
+@pytest.mark.parametrize("func", [db.iter_for_csv, db.iter_sessions])
+@pytest.mark.parametrize(
+    "since, until",
+    [("2022-07-01", "2022-07-31"), ("2022-07-01", None), (None, "2022-07-31")],
+)
+def test_session_filters(conn, func, since, until):
+    plan = query_plan(conn, func, since, until)
+    assert_no_full_scan(plan)
+    assert uses(plan, "sessions_date_idx"), plan